@@ -1,72 +1,199 @@
 #!/usr/bin/env python3
-# Run: HEADLESS=false python fetch.py
-
-import asyncio, json, os, re, tempfile
+# Run: HEADLESS=false python fetch_and_push.py [run | run-one NAME | daemon | bench | status]
+#
+# Heavy deps (pandas, gspread, google-auth, Playwright) are imported inside the code
+# paths that need them, so `status`, `--help` and helper-only imports stay fast.
+
+from __future__ import annotations
+
+import argparse, asyncio, atexit, heapq, json, os, random, re, signal, subprocess, sys, tempfile, threading, time
+import contextlib, contextvars, numbers, urllib.parse, urllib.request
+from collections import deque
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional
-import os
-import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
-from gspread_dataframe import set_with_dataframe
-from dotenv import load_dotenv
-from playwright.async_api import async_playwright, TimeoutError as PWTimeout
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # ===================== ENV =====================
-os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", "/var/secrets/google/SHEETS_SA_JSON")
-SA_PATH   = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", "sa.json")
-
-ARMS_USER = os.getenv("ARMS_USERNAME") or os.getenv("ARMS_USER")
-ARMS_PASS = os.getenv("ARMS_PASSWORD") or os.getenv("ARMS_PASS")
-ARMS_BASE = (os.getenv("ARMS_BASE_URL") or "").rstrip("/")
-ARMS_LOGIN_URL = os.getenv("ARMS_LOGIN_URL") or (f"{ARMS_BASE}/login" if ARMS_BASE else None)
-SHEET_ID  = os.getenv("SHEET_ID")  # we’ll set this as a normal env var on deploy
 HEADLESS  = (os.getenv("HEADLESS", "true").lower() != "false")
 
-missing = []
-if not ARMS_USER: missing.append("ARMS_USERNAME/ARMS_USER")
-if not ARMS_PASS: missing.append("ARMS_PASSWORD/ARMS_PASS")
-if not (ARMS_BASE or ARMS_LOGIN_URL): missing.append("ARMS_BASE_URL or ARMS_LOGIN_URL")
-if not SHEET_ID:  missing.append("SHEET_ID")
-if not SA_PATH:   missing.append("GOOGLE_APPLICATION_CREDENTIALS/sa.json")
-if missing:
-    raise SystemExit(f"[fatal] Missing required env: {', '.join(missing)}")
-if not ARMS_LOGIN_URL:
-    ARMS_LOGIN_URL = f"{ARMS_BASE}/login"
-    
+# Filled in by load_env() on the code paths that talk to ARMS / Sheets.
+SA_PATH: Optional[str] = None
+ARMS_USER: Optional[str] = None
+ARMS_PASS: Optional[str] = None
+ARMS_BASE: str = ""
+ARMS_LOGIN_URL: Optional[str] = None
+SHEET_ID: Optional[str] = None
+
+def load_env():
+    """Read and validate the ARMS / Sheets env vars; exits with the list of missing ones."""
+    global SA_PATH, ARMS_USER, ARMS_PASS, ARMS_BASE, ARMS_LOGIN_URL, SHEET_ID, HEADLESS
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()  # local dev convenience; no-op on Cloud Run
+    except ImportError:
+        pass
+
+    os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", "/var/secrets/google/SHEETS_SA_JSON")
+    SA_PATH   = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", "sa.json")
+
+    ARMS_USER = os.getenv("ARMS_USERNAME") or os.getenv("ARMS_USER")
+    ARMS_PASS = os.getenv("ARMS_PASSWORD") or os.getenv("ARMS_PASS")
+    ARMS_BASE = (os.getenv("ARMS_BASE_URL") or "").rstrip("/")
+    ARMS_LOGIN_URL = os.getenv("ARMS_LOGIN_URL") or (f"{ARMS_BASE}/login" if ARMS_BASE else None)
+    SHEET_ID  = os.getenv("SHEET_ID")  # we’ll set this as a normal env var on deploy
+    HEADLESS  = (os.getenv("HEADLESS", "true").lower() != "false")
+
+    missing = []
+    if not ARMS_USER: missing.append("ARMS_USERNAME/ARMS_USER")
+    if not ARMS_PASS: missing.append("ARMS_PASSWORD/ARMS_PASS")
+    if not (ARMS_BASE or ARMS_LOGIN_URL): missing.append("ARMS_BASE_URL or ARMS_LOGIN_URL")
+    if not SHEET_ID:  missing.append("SHEET_ID")
+    if not SA_PATH:   missing.append("GOOGLE_APPLICATION_CREDENTIALS/sa.json")
+    if missing:
+        raise SystemExit(f"[fatal] Missing required env: {', '.join(missing)}")
+    if not ARMS_LOGIN_URL:
+        ARMS_LOGIN_URL = f"{ARMS_BASE}/login"
+
 # ===================== SHEETS HELPERS =====================
 def _gs_client():
+    import gspread
+    from google.oauth2.service_account import Credentials
     scopes = ["https://www.googleapis.com/auth/spreadsheets",
               "https://www.googleapis.com/auth/drive"]
     creds = Credentials.from_service_account_file(SA_PATH, scopes=scopes)
     return gspread.authorize(creds)
 
-def overwrite_tab(df: pd.DataFrame, tab_name: str):
+SHEETS_WRITES_PER_MIN = float(os.getenv("SHEETS_WRITES_PER_MIN", "60"))  # per-user Sheets quota
+SHEETS_CHUNK_CELLS    = int(os.getenv("SHEETS_CHUNK_CELLS", "50000"))     # cells per values.update call
+SHEETS_WORKERS        = int(os.getenv("SHEETS_WORKERS", "4"))
+SHEETS_MAX_RETRIES    = int(os.getenv("SHEETS_MAX_RETRIES", "6"))
+SHEETS_RETRY_STATUS   = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """Thread-safe token bucket: refills `per_min` tokens a minute, bursts up to `burst`."""
+    def __init__(self, per_min: float, burst: Optional[float] = None):
+        self.rate = per_min / 60.0
+        self.capacity = burst if burst is not None else max(1.0, min(per_min / 6.0, 10.0))
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+SHEETS_BUCKET = TokenBucket(SHEETS_WRITES_PER_MIN)
+
+def _http_status(e: Exception) -> Optional[int]:
+    return getattr(getattr(e, "response", None), "status_code", None)
+
+def sheets_call(fn, *args, what: str = "call", **kwargs):
+    """
+    One rate-limited Sheets API call. 429/5xx and connection errors are retried
+    with jittered exponential backoff; anything else is raised straight away.
+    """
+    for attempt in range(SHEETS_MAX_RETRIES + 1):
+        SHEETS_BUCKET.acquire()
+        METRICS.add("sheets_calls")
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            code = _http_status(e)
+            retryable = code in SHEETS_RETRY_STATUS or (code is None and isinstance(e, OSError))
+            if not retryable or attempt == SHEETS_MAX_RETRIES:
+                raise
+            delay = min(64.0, 2.0 ** attempt) * random.uniform(0.5, 1.0)
+            print(f"[warn] Sheets {what}: {code or type(e).__name__}; retry {attempt + 1}/{SHEETS_MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+
+def _cell(v):
+    # what set_with_dataframe sends: numbers as-is, everything else as text, and a
+    # leading apostrophe doubled so USER_ENTERED keeps it instead of eating it
+    if isinstance(v, numbers.Real):
+        return v
+    v = str(v)
+    return f"'{v}" if v.startswith("'") else v
+
+def _frame_values(df: pd.DataFrame) -> List[List]:
+    return [[_cell(v) for v in row] for row in df.astype(object).where(df.notna(), "").values.tolist()]
+
+def write_rows(ws, rows: List[List], start_row: int = 1):
+    """
+    Write `rows` starting at `start_row`, split into row-range chunks of about
+    SHEETS_CHUNK_CELLS cells that upload concurrently under the shared rate limit.
+    """
+    from gspread.utils import rowcol_to_a1
+    if not rows:
+        return
+    n_cols = max(len(r) for r in rows) or 1
+    step = max(1, SHEETS_CHUNK_CELLS // n_cols)
+    chunks = []
+    for i in range(0, len(rows), step):
+        block = rows[i:i + step]
+        a1 = f"{rowcol_to_a1(start_row + i, 1)}:{rowcol_to_a1(start_row + i + len(block) - 1, n_cols)}"
+        chunks.append((a1, block))
+
+    def _put(chunk):
+        a1, block = chunk
+        METRICS.add("bytes_uploaded", sum(len(str(v)) for r in block for v in r))
+        sheets_call(ws.update, values=block, range_name=a1, value_input_option="USER_ENTERED", what=f"update {a1}")
+
+    if len(chunks) == 1:
+        _put(chunks[0]); return
+    with ThreadPoolExecutor(max_workers=min(SHEETS_WORKERS, len(chunks))) as pool:
+        for fut in [pool.submit(_put, c) for c in chunks]:
+            fut.result()  # re-raise the first chunk failure
+
+def overwrite_tab(df: pd.DataFrame, tab_name: str, sheet_id: Optional[str] = None):
+    import gspread
     gc = _gs_client()
-    sh = gc.open_by_key(SHEET_ID)
+    sh = sheets_call(gc.open_by_key, sheet_id or SHEET_ID, what="open")
     try:
-        ws = sh.worksheet(tab_name)
+        ws = sheets_call(sh.worksheet, tab_name, what="worksheet")
     except gspread.exceptions.WorksheetNotFound:
-        ws = sh.add_worksheet(title=tab_name, rows=100, cols=26)
-    ws.clear()
-    df.columns = [str(c) for c in df.columns]
-    set_with_dataframe(ws, df, include_index=False, include_column_header=True, resize=True)
+        ws = sheets_call(sh.add_worksheet, title=tab_name, rows=100, cols=26, what="add_worksheet")
+    sheets_call(ws.clear, what="clear")
+    header = [str(c) for c in df.columns]  # don't mutate: other sinks may be reading df
+    sheets_call(ws.resize, rows=len(df) + 1, cols=max(1, len(header)), what="resize")
+    write_rows(ws, [header] + _frame_values(df))
 
 # ===================== UTILS / CACHE =====================
 CACHE_PATH = Path(__file__).with_name(".exports_cache.json")
 
-def _read_cache():
+def _read_json(path: Path):
     try:
-        return json.loads(CACHE_PATH.read_text())
+        return json.loads(path.read_text())
     except Exception:
         return {}
 
-def _write_cache(d):
+def _write_json(path: Path, d):
+    # write-then-rename so concurrent tenant processes never read a half-written file
     try:
-        CACHE_PATH.write_text(json.dumps(d, indent=2))
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(d, indent=2, default=str))
+        os.replace(tmp, path)
     except Exception:
         pass
 
+def _read_cache():
+    return _read_json(CACHE_PATH)
+
+def _write_cache(d):
+    _write_json(CACHE_PATH, d)
+
 def _rx_startswith(s: str):
     return re.compile(rf"^\s*{re.escape(s)}\b", re.I)
 
@@ -79,6 +206,338 @@ def _filename_matches_layout(fn: str, tokens):
     s = re.sub(r"[^a-z0-9]+", " ", fn.lower())
     return all(t in s for t in tokens)
 
+# ===================== ADAPTIVE TIMEOUTS =====================
+STEP_STATS_PATH  = Path(__file__).with_name(".step_stats.json")
+STEP_STATS_KEEP  = 50    # samples kept per step
+STEP_MIN_SAMPLES = 5     # below this, use the hard-coded default
+TIMEOUT_MARGIN   = float(os.getenv("TIMEOUT_MARGIN", "2.0"))
+
+def _pct(xs: List[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(q * (len(xs) - 1))))]
+
+class StepStats:
+    """
+    Rolling per-step latencies (seconds) persisted between runs.
+    A step's budget is p95 × TIMEOUT_MARGIN clamped to [floor, 4 × default], then
+    widened by today's slowness (this run's page-settle p50 vs the historical p50).
+    Steps with too little history keep their hard-coded default. The default floor is
+    default/4, but ¾ of the default until this run has settled a few pages: the first
+    waits of a run (login) can't see today's slowness yet.
+    """
+    def __init__(self, path: Path):
+        self.path = path
+        self._d: Optional[Dict[str, List[float]]] = None
+        self._run: Dict[str, List[float]] = {}
+
+    @property
+    def d(self) -> Dict[str, List[float]]:
+        if self._d is None:
+            self._d = _read_json(self.path)
+        return self._d
+
+    def new_run(self):
+        """Forget this run's samples, so slowness() reflects the run that's starting."""
+        self._run = {}
+
+    def record(self, step: str, seconds: float):
+        xs = self.d.setdefault(step, [])
+        xs.append(round(seconds, 3))
+        del xs[:-STEP_STATS_KEEP]
+        self._run.setdefault(step, []).append(seconds)
+
+    def p(self, step: str, q: float) -> Optional[float]:
+        xs = self.d.get(step) or []
+        return _pct(xs, q) if len(xs) >= STEP_MIN_SAMPLES else None
+
+    def warm(self) -> bool:
+        return len(self._run.get("page.settle") or []) >= 3
+
+    def slowness(self) -> float:
+        run, hist = self._run.get("page.settle") or [], self.d.get("page.settle") or []
+        if not self.warm() or len(hist) < STEP_MIN_SAMPLES:
+            return 1.0
+        base = _pct(hist, 0.5)
+        return min(4.0, max(1.0, _pct(run, 0.5) / base)) if base > 0 else 1.0
+
+    def timeout_ms(self, step: str, default_ms: int, floor_ms: Optional[int] = None) -> int:
+        p95 = self.p(step, 0.95)
+        if p95 is None:
+            return default_ms
+        floor = floor_ms if floor_ms is not None else max(100, default_ms // 4 if self.warm() else default_ms * 3 // 4)
+        cap = default_ms * 4
+        budget = min(cap, max(floor, p95 * 1000 * TIMEOUT_MARGIN)) * self.slowness()
+        return int(min(cap, budget))
+
+    def pause_s(self, default_s: float) -> float:
+        return default_s * self.slowness()
+
+    def save(self):
+        if self._d is not None:
+            _write_json(self.path, self._d)
+
+STATS = StepStats(STEP_STATS_PATH)
+
+def tmo(step: str, default_ms: int, floor_ms: Optional[int] = None) -> int:
+    return STATS.timeout_ms(step, default_ms, floor_ms)
+
+async def within(step: str, default_ms: int, fn, floor_ms: Optional[int] = None):
+    """Run fn(timeout_ms) under the step's adaptive budget; record its latency when it succeeds."""
+    t0 = time.perf_counter()
+    budget = tmo(step, default_ms, floor_ms)
+    try:
+        out = await fn(budget)
+    except Exception as e:
+        flight_note("fail", step, f"{type(e).__name__} after {time.perf_counter() - t0:.2f}s (budget {budget}ms)")
+        raise
+    STATS.record(step, time.perf_counter() - t0)
+    flight_note("ok", step, f"{time.perf_counter() - t0:.2f}s")
+    return out
+
+async def settle(scope):
+    """wait_for_load_state('networkidle'), timed — it is the slowness signal for every budget."""
+    t0 = time.perf_counter()
+    await scope.wait_for_load_state("networkidle")
+    STATS.record("page.settle", time.perf_counter() - t0)
+
+async def pause(default_s: float):
+    await asyncio.sleep(STATS.pause_s(default_s))
+
+POLL_MIN_S = float(os.getenv("POLL_MIN_S", "1.0"))
+POLL_MAX_S = float(os.getenv("POLL_MAX_S", "15"))
+
+class PollSchedule:
+    """
+    Delays for a wait loop whose duration is learned under `step`: sparse while well
+    short of the ETA (p50), every POLL_MIN_S from 0.8 × ETA to the usual worst case
+    (p90), then backing off ×1.5 up to POLL_MAX_S when ARMS is running late.
+    Scaled by today's slowness. Without history it polls every POLL_MIN_S.
+    """
+    def __init__(self, step: str):
+        self.eta, self.late = STATS.p(step, 0.5), STATS.p(step, 0.9)
+        self.backoff = POLL_MIN_S
+
+    def next(self, elapsed: float) -> float:
+        if self.eta is None:
+            return POLL_MIN_S
+        k = STATS.slowness()
+        lead, late = 0.8 * self.eta * k, max(self.late, 1.2 * self.eta) * k
+        if elapsed < lead:
+            return max(POLL_MIN_S, min(POLL_MAX_S, (lead - elapsed) / 2))
+        if elapsed < late:
+            return POLL_MIN_S
+        self.backoff = min(POLL_MAX_S, self.backoff * 1.5)
+        return self.backoff
+
+# ===================== FALLBACK PROFILER =====================
+class FallbackProfiler:
+    """
+    Per helper/chain: how many candidates were tried, how many failed, the time lost
+    in the failed ones, and which candidate usually wins. Fed by `async with candidate(...)`.
+    """
+    def __init__(self):
+        self.stats: Dict[str, Dict] = {}
+
+    def record(self, chain: str, cand, ok: bool, seconds: float):
+        st = self.stats.setdefault(chain, {"attempts": 0, "failed": 0, "failed_s": 0.0, "wins": {}})
+        st["attempts"] += 1
+        if ok:
+            st["wins"][str(cand)] = st["wins"].get(str(cand), 0) + 1
+        else:
+            st["failed"] += 1
+            st["failed_s"] += seconds
+
+    def report(self, top: int = 8):
+        rows = sorted(self.stats.items(), key=lambda kv: kv[1]["failed_s"], reverse=True)
+        rows = [(k, v) for k, v in rows if v["failed"]][:top]
+        if not rows:
+            return
+        print("[info] fallback waste (time lost to candidates that didn't match):")
+        for chain, st in rows:
+            wins = ", ".join(f"#{c}×{n}" for c, n in sorted(st["wins"].items(), key=lambda kv: -kv[1])) or "none"
+            print(f"  {chain:<45} {st['failed_s']:7.1f}s  {st['failed']}/{st['attempts']} failed  wins: {wins}")
+
+FALLBACKS = FallbackProfiler()
+
+class candidate:
+    """`async with candidate("helper/chain", i):` — times one fallback attempt; exceptions pass through."""
+    def __init__(self, chain: str, cand):
+        self.chain, self.cand = chain, cand
+
+    async def __aenter__(self):
+        self.t0 = time.perf_counter()
+
+    async def __aexit__(self, et, ev, tb):
+        FALLBACKS.record(self.chain, self.cand, et is None, time.perf_counter() - self.t0)
+        return False
+
+# ===================== RUN HISTORY =====================
+# Every run appends its per-phase durations and counters (rows, bytes down/up,
+# Sheets calls) to .run_history.sqlite, then compares each phase against the median
+# of the same phase over the previous HISTORY_BASELINE_RUNS runs of this tenant.
+HISTORY_DB                = Path(__file__).with_name(".run_history.sqlite")
+HISTORY_BASELINE_RUNS     = int(os.getenv("HISTORY_BASELINE_RUNS", "10"))
+HISTORY_REGRESSION_FACTOR = float(os.getenv("HISTORY_REGRESSION_FACTOR", "2.0"))
+HISTORY_REGRESSION_MIN_S  = float(os.getenv("HISTORY_REGRESSION_MIN_S", "15"))  # ignore small absolute jumps
+
+class RunMetrics:
+    """Thread-safe per-run phase timings and counters."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, float] = {}
+
+    def add(self, counter: str, n: float = 1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def record(self, phase: str, seconds: float):
+        with self.lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0)
+
+METRICS = RunMetrics()
+
+def _history_db():
+    import sqlite3
+    con = sqlite3.connect(HISTORY_DB, timeout=30)
+    con.executescript("""
+        CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, tenant TEXT, started TEXT,
+                                         seconds REAL, written INTEGER, failed INTEGER);
+        CREATE TABLE IF NOT EXISTS metrics (run_id TEXT, kind TEXT, name TEXT, value REAL);
+        CREATE INDEX IF NOT EXISTS metrics_name ON metrics (kind, name);
+    """)
+    return con
+
+def save_run_history(run_id: str, started: datetime, seconds: float, written: int, failed: int):
+    con = _history_db()
+    try:
+        with con:
+            con.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                        (run_id, os.getenv("ARMS_TENANT", ""), started.isoformat(timespec="seconds"),
+                         seconds, written, failed))
+            con.executemany("INSERT INTO metrics VALUES (?, ?, ?, ?)",
+                            [(run_id, "phase", k, v) for k, v in METRICS.phases.items()]
+                            + [(run_id, "counter", k, v) for k, v in METRICS.counters.items()])
+    finally:
+        con.close()
+
+def check_regressions(run_id: str) -> List[str]:
+    """Warn about phases of `run_id` that took HISTORY_REGRESSION_FACTOR× their rolling median."""
+    con = _history_db()
+    try:
+        current = con.execute("SELECT name, value FROM metrics WHERE run_id = ? AND kind = 'phase'", (run_id,)).fetchall()
+        warnings = []
+        for name, value in current:
+            past = [v for (v,) in con.execute(
+                """SELECT m.value FROM metrics m JOIN runs r ON r.run_id = m.run_id
+                   WHERE m.kind = 'phase' AND m.name = ? AND r.tenant = ? AND r.run_id != ?
+                   ORDER BY r.started DESC LIMIT ?""",
+                (name, os.getenv("ARMS_TENANT", ""), run_id, HISTORY_BASELINE_RUNS))]
+            if len(past) < 3:
+                continue
+            base = sorted(past)[len(past) // 2]
+            if value > base * HISTORY_REGRESSION_FACTOR and value - base > HISTORY_REGRESSION_MIN_S:
+                warnings.append(name)
+                print(f"[warn] regression: {name} took {value:.0f}s vs a median of {base:.0f}s over the last {len(past)} runs")
+        return warnings
+    finally:
+        con.close()
+
+# ===================== FLIGHT RECORDER =====================
+FLIGHT_DIR       = Path(os.getenv("FLIGHT_DIR") or Path(__file__).with_name("flight_records"))
+FLIGHT_ACTIONS   = int(os.getenv("FLIGHT_ACTIONS", "200"))
+FLIGHT_NETWORK   = int(os.getenv("FLIGHT_NETWORK", "100"))
+FLIGHT_SNAPSHOTS = int(os.getenv("FLIGHT_SNAPSHOTS", "3"))
+FLIGHT_MAX_DUMPS = int(os.getenv("FLIGHT_MAX_DUMPS", "3"))  # per export
+
+class FlightRecorder:
+    """
+    Cheap always-on recorder for one export: the last FLIGHT_ACTIONS step results,
+    FLIGHT_NETWORK response summaries and FLIGHT_SNAPSHOTS DOM snapshots, all in
+    ring buffers. Nothing touches disk until dump(), which also takes a screenshot.
+    """
+    def __init__(self, page, label: str):
+        self.page, self.label = page, label
+        self.actions: deque = deque(maxlen=FLIGHT_ACTIONS)
+        self.network: deque = deque(maxlen=FLIGHT_NETWORK)
+        self.snapshots: deque = deque(maxlen=FLIGHT_SNAPSHOTS)
+        self.dumps = 0
+
+    def attach(self):
+        self.page.on("response", self._on_response)
+        self.page.on("requestfailed", self._on_failed)
+
+    def detach(self):
+        for ev, fn in (("response", self._on_response), ("requestfailed", self._on_failed)):
+            try: self.page.remove_listener(ev, fn)
+            except Exception: pass
+
+    def _on_response(self, resp):
+        req = resp.request
+        self.network.append((datetime.now().isoformat(timespec="milliseconds"), req.method,
+                             resp.status, req.resource_type, req.url[:300]))
+
+    def _on_failed(self, req):
+        self.network.append((datetime.now().isoformat(timespec="milliseconds"), req.method,
+                             f"FAILED {req.failure}", req.resource_type, req.url[:300]))
+
+    def note(self, kind: str, step: str, detail: str = ""):
+        self.actions.append((datetime.now().isoformat(timespec="milliseconds"), kind, step, detail))
+
+    async def snapshot(self, label: str):
+        try:
+            html = await self.page.content()
+            self.snapshots.append((label, self.page.url, html[:500_000]))
+        except Exception:
+            pass
+
+    async def dump(self, exc: BaseException, step: str):
+        if self.dumps >= FLIGHT_MAX_DUMPS:
+            return
+        self.dumps += 1
+        safe = lambda x: re.sub(r"[^\w-]+", "_", x)
+        stem = f"{datetime.now():%Y%m%d-%H%M%S}-{safe(self.label)}-{safe(step)}"
+        try:
+            FLIGHT_DIR.mkdir(parents=True, exist_ok=True)
+            try: await self.page.screenshot(path=str(FLIGHT_DIR / f"{stem}.png"), full_page=True, timeout=5000)
+            except Exception: pass
+            for i, (label, url, html) in enumerate(self.snapshots):
+                (FLIGHT_DIR / f"{stem}.dom{i}.html").write_text(f"<!-- {label} @ {url} -->\n{html}")
+            (FLIGHT_DIR / f"{stem}.json").write_text(json.dumps({
+                "export": self.label, "step": step, "error": f"{type(exc).__name__}: {exc}",
+                "url": getattr(self.page, "url", None),
+                "actions": list(self.actions), "network": list(self.network),
+                "snapshots": [(label, url) for label, url, _ in self.snapshots],
+            }, indent=1, default=str))
+            print(f"[info] flight record written: {FLIGHT_DIR / stem}.*")
+        except Exception as e:
+            print(f"[warn] could not write flight record: {e}")
+
+_FLIGHT: contextvars.ContextVar = contextvars.ContextVar("flight", default=None)
+
+def flight_note(kind: str, step: str, detail: str = ""):
+    rec = _FLIGHT.get()
+    if rec: rec.note(kind, step, detail)
+
+async def flight_snapshot(label: str):
+    rec = _FLIGHT.get()
+    if rec: await rec.snapshot(label)
+
+async def flight_dump(exc: BaseException, step: str):
+    rec = _FLIGHT.get()
+    if rec: await rec.dump(exc, step)
+
 # ===================== NAVIGATION / FILTERS =====================
 def _rx_exact(s: str):
     return re.compile(rf"^\s*{re.escape(s)}\s*$", re.I)
@@ -92,62 +551,66 @@ async def click_recruiting_recruits(page):
             has_text=re.compile(r"^\s*Close Menu|Open Menu\s*$", re.I)
         ).first
         if await chevron.count():
-            try: await chevron.click(timeout=800)
+            try: await within("nav.menu_toggle", 800, lambda t: chevron.click(timeout=t))
             except: pass
     except: pass
 
     # Click "Recruiting" in the left rail
-    for loc in [
+    for i, loc in enumerate([
         page.get_by_role("link", name=_rx_exact("Recruiting")).first,
         page.get_by_role("button", name=_rx_exact("Recruiting")).first,
         page.locator("nav,aside").get_by_text(_rx_exact("Recruiting")).first,
         # Fallback to the icon-only entry (SVG id has 'recruiting-icon')
         page.locator("nav svg use[href*='recruiting-icon'], nav svg use[xlink\\:href*='recruiting-icon']").first
-    ]:
+    ]):
         try:
-            await loc.scroll_into_view_if_needed(); await loc.click(timeout=3000); break
+            async with candidate("click_recruiting_recruits/recruiting", i):
+                await loc.scroll_into_view_if_needed(); await within("nav.recruiting", 3000, lambda t: loc.click(timeout=t))
+            break
         except: continue
     else:
         raise RuntimeError("Could not find 'Recruiting' in left navigation.")
 
     # Click "Recruits" in the flyout/submenu
-    for loc in [
+    for i, loc in enumerate([
         page.get_by_role("link", name=_rx_exact("Recruits")).first,
         page.get_by_role("menuitem", name=_rx_exact("Recruits")).first,
         page.get_by_text(_rx_exact("Recruits")).first,
-    ]:
+    ]):
         try:
-            await loc.click(timeout=4000); break
+            async with candidate("click_recruiting_recruits/recruits", i):
+                await within("nav.recruits", 4000, lambda t: loc.click(timeout=t))
+            break
         except: continue
     else:
         raise RuntimeError("Could not click ‘Recruits’ in the flyout.")
 
-    await page.wait_for_load_state("networkidle")
+    await settle(page)
 
 
 async def _expand_section(scope, title_regex):
     try:
         hdr = scope.get_by_role("button", name=title_regex).first
-        await hdr.wait_for(timeout=1200)
+        await within("filters.section_header", 1200, lambda t: hdr.wait_for(timeout=t))
         expanded = await hdr.get_attribute("aria-expanded")
         if expanded is not None and expanded.lower() == "false":
-            await hdr.click(); await scope.wait_for_load_state("networkidle"); await asyncio.sleep(0.1); return
+            await hdr.click(); await settle(scope); await pause(0.1); return
     except: pass
     try:
         hdr2 = scope.locator(".mat-expansion-panel-header").filter(has=scope.get_by_text(title_regex)).first
-        await hdr2.wait_for(timeout=1200)
+        await within("filters.section_header", 1200, lambda t: hdr2.wait_for(timeout=t))
         classes = (await hdr2.get_attribute("class")) or ""
         if "mat-expanded" not in classes:
-            await hdr2.click(); await asyncio.sleep(0.1)
+            await hdr2.click(); await pause(0.1)
     except: pass
 
 async def _click_link_in_section(scope, section_title_rx, link_text_rx):
     sec = scope.locator("section,div,aside").filter(has=scope.get_by_text(section_title_rx)).first
-    try: await sec.wait_for(timeout=1000)
+    try: await within("filters.section", 1000, lambda t: sec.wait_for(timeout=t))
     except: sec = scope
     for loc in [sec.get_by_role("link", name=link_text_rx).first, sec.get_by_text(link_text_rx).first]:
         try:
-            await loc.wait_for(timeout=600); await loc.click(); await asyncio.sleep(0.05); return True
+            await within("filters.link", 600, lambda t: loc.wait_for(timeout=t)); await loc.click(); await pause(0.05); return True
         except: continue
     return False
 
@@ -156,11 +619,11 @@ async def _scroll_until_visible(scope, regex, max_steps=20):
     for _ in range(max_steps):
         try:
             el = scope.get_by_text(regex).first
-            await el.scroll_into_view_if_needed(); await el.wait_for(timeout=300); return True
+            await el.scroll_into_view_if_needed(); await within("filters.scroll_item", 300, lambda t: el.wait_for(timeout=t)); return True
         except:
             try: await container.evaluate("(el)=>el.scrollBy(0,300)")
             except: await scope.evaluate("()=>window.scrollBy(0,300)")
-            await asyncio.sleep(0.05)
+            await pause(0.05)
     return False
 
 async def ensure_checkbox_checked(scope, name_regex):
@@ -169,29 +632,35 @@ async def ensure_checkbox_checked(scope, name_regex):
         if await host.count():
             classes = (await host.get_attribute("class")) or ""
             if "mat-checkbox-checked" in classes: return
-            for tgt_sel in [".mat-checkbox-inner-container", "label", ".mat-checkbox-layout"]:
+            for i, tgt_sel in enumerate([".mat-checkbox-inner-container", "label", ".mat-checkbox-layout"]):
                 tgt = host.locator(tgt_sel)
                 try:
-                    await tgt.scroll_into_view_if_needed(); await tgt.click(); return
+                    async with candidate("ensure_checkbox_checked", i):
+                        await tgt.scroll_into_view_if_needed(); await tgt.click()
+                    return
                 except: continue
-            await host.click(force=True); return
+            async with candidate("ensure_checkbox_checked", "host-force"):
+                await host.click(force=True)
+            return
     except: pass
     try:
-        lbl = scope.get_by_label(name_regex).first
-        await lbl.scroll_into_view_if_needed()
-        try: await lbl.check()
-        except: await lbl.click()
+        async with candidate("ensure_checkbox_checked", "label"):
+            lbl = scope.get_by_label(name_regex).first
+            await lbl.scroll_into_view_if_needed()
+            try: await lbl.check()
+            except: await lbl.click()
         return
     except: pass
-    await scope.get_by_text(name_regex).first.click(force=True)
+    async with candidate("ensure_checkbox_checked", "text-force"):
+        await scope.get_by_text(name_regex).first.click(force=True)
 
 async def find_filters_scope(page):
     try:
-        await page.get_by_text(_rx_exact("Grad. Year")).first.wait_for(timeout=1200); return page
+        await within("filters.scope", 1200, lambda t: page.get_by_text(_rx_exact("Grad. Year")).first.wait_for(timeout=t)); return page
     except: pass
     for fr in page.frames:
         try:
-            await fr.get_by_text(_rx_exact("Grad. Year")).first.wait_for(timeout=800); return fr
+            await within("filters.scope_frame", 800, lambda t: fr.get_by_text(_rx_exact("Grad. Year")).first.wait_for(timeout=t)); return fr
         except: continue
     return page
     
@@ -334,6 +803,1215 @@ def clean_mobile_numbers(df: pd.DataFrame) -> pd.DataFrame:
 
     return df
         
+# ===================== TRANSFORMS / DERIVED TABS =====================
+TRANSFORMS = {
+    "clean_mobile_numbers": clean_mobile_numbers,
+    "add_full_name_columns": add_full_name_columns,
+    "add_social_urls": add_social_urls,
+}
+DEFAULT_TRANSFORMS = ["clean_mobile_numbers", "add_full_name_columns", "add_social_urls"]
+
+# Frames of at least TRANSFORM_PARALLEL_ROWS rows are sharded by row range across a
+# process pool. The frame crosses over once, as an Arrow IPC stream in shared memory;
+# each worker slices its range out of it and hands its result back the same way.
+# Transforms run there by name, so anything in TRANSFORMS must be row-wise.
+TRANSFORM_PARALLEL_ROWS = int(os.getenv("TRANSFORM_PARALLEL_ROWS", "250000"))
+TRANSFORM_WORKERS       = int(os.getenv("TRANSFORM_WORKERS", str(os.cpu_count() or 1)))
+_TRANSFORM_POOL = None
+_TRANSFORM_POOL_LOCK = threading.Lock()
+
+def _transform_pool() -> ProcessPoolExecutor:
+    global _TRANSFORM_POOL
+    with _TRANSFORM_POOL_LOCK:
+        if _TRANSFORM_POOL is None:
+            _TRANSFORM_POOL = ProcessPoolExecutor(max_workers=TRANSFORM_WORKERS,
+                                                  mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(_TRANSFORM_POOL.shutdown)
+        return _TRANSFORM_POOL
+
+def _to_shm(table) -> tuple:
+    """Serialize an Arrow table into a new shared-memory block → (name, size)."""
+    import pyarrow as pa
+    from multiprocessing import shared_memory
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    buf = sink.getvalue()
+    shm = shared_memory.SharedMemory(create=True, size=max(1, buf.size))
+    try:
+        shm.buf[:buf.size] = memoryview(buf).cast("B")  # arrow exports 'b', shm.buf is 'B'
+    except BaseException:
+        shm.close(); shm.unlink()
+        raise
+    shm.close()
+    return shm.name, buf.size
+
+def _from_shm(name: str, size: int, offset: int = 0, length: Optional[int] = None, unlink: bool = False) -> pd.DataFrame:
+    import pyarrow as pa
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        view = shm.buf[:size]
+        table = pa.ipc.open_stream(pa.py_buffer(view)).read_all()
+        if length is not None:
+            table = table.slice(offset, length)
+        df = table.to_pandas().copy()  # own the data: numeric columns can be views into shm
+        del table
+        view.release()  # no exports may be left when the block is closed
+    finally:
+        shm.close()
+        if unlink:
+            shm.unlink()
+    return df
+
+def _drop_shm(name: str):
+    from multiprocessing import shared_memory
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+        shm.close(); shm.unlink()
+    except FileNotFoundError:
+        pass
+
+def _transform_shard(name: str, size: int, offset: int, length: int, names: List[str]) -> tuple:
+    import pyarrow as pa
+    df = _from_shm(name, size, offset, length)
+    for t in names:
+        df = TRANSFORMS[t](df)
+    return _to_shm(pa.Table.from_pandas(df, preserve_index=False))
+
+def parallel_transforms(df: pd.DataFrame, names: List[str]) -> pd.DataFrame:
+    """apply_transforms over row-range shards in the transform pool, reassembled in order."""
+    import pandas as pd
+    import pyarrow as pa
+    t0 = time.perf_counter()
+    name, size = _to_shm(pa.Table.from_pandas(df, preserve_index=False))
+    shards = max(1, TRANSFORM_WORKERS)
+    step = -(-len(df) // shards)
+    try:
+        futs = [_transform_pool().submit(_transform_shard, name, size, off, step, names)
+                for off in range(0, len(df), step)]
+        parts, err = [], None
+        for fut in futs:  # collect in submit order so the row order is kept
+            try:
+                res = fut.result()
+            except Exception as e:
+                err = err or e
+                continue
+            if err is None:
+                parts.append(_from_shm(*res, unlink=True))
+            else:
+                _drop_shm(res[0])
+        if err is not None:
+            raise err
+    finally:
+        _drop_shm(name)
+    out = pd.concat(parts, ignore_index=True)
+    out.index = df.index
+    print(f"[info] transforms on {len(df):,} rows across {len(futs)} processes in {time.perf_counter() - t0:.1f}s")
+    return out
+
+def apply_transforms(df: pd.DataFrame, names: Optional[List[str]]) -> pd.DataFrame:
+    if (names and len(df) >= TRANSFORM_PARALLEL_ROWS and TRANSFORM_WORKERS > 1
+            and all(t in TRANSFORMS for t in names)):
+        try:
+            return parallel_transforms(df, list(names))
+        except Exception as e:
+            print(f"[warn] parallel transforms failed ({e}) — running in-process")
+    for t in names or []:
+        fn = TRANSFORMS.get(t)
+        if fn is None:
+            print(f"[warn] unknown transform '{t}' (skipped)")
+            continue
+        df = fn(df)
+    return df
+
+def export_outputs(exp: Dict) -> List[Dict]:
+    """
+    One source export can feed several tabs. Each output is
+      {"tab": ..., "columns": [...], "rename": {...}, "transforms": [...]}
+    • the export's own "tab" (if set) gets the full transformed frame
+    • each entry in "derived" is projected down to its "columns"
+    """
+    outs = []
+    if exp.get("tab"):
+        outs.append({"tab": exp["tab"]})
+    for d in exp.get("derived") or []:
+        if not d.get("tab"):
+            print(f"[warn] derived output without 'tab' in {exp.get('name', 'Unnamed')} (skipped)")
+            continue
+        outs.append(d)
+    return outs
+
+def _norm_col(c) -> str:
+    return re.sub(r"\s+", " ", str(c)).strip().lower()
+
+def project_columns(df: pd.DataFrame, out: Dict, warn: bool = True,
+                    applied: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Select the output's columns (in declared order), rename, then run its own transforms,
+    except those in `applied` (already run on the source frame — they aren't idempotent).
+    Column names match exactly first, then ignoring case/whitespace; unknown ones are reported.
+    """
+    cols = out.get("columns")
+    if cols:
+        by_norm = {_norm_col(c): c for c in df.columns}
+        picked, missing = [], []
+        for c in cols:
+            src = c if c in df.columns else by_norm.get(_norm_col(c))
+            if src is None: missing.append(c)
+            elif src not in picked: picked.append(src)
+        if missing and warn:
+            print(f"[warn] '{out['tab']}': columns not in export: {', '.join(missing)}")
+        df = df[picked].copy()
+    else:
+        df = df.copy()
+    if out.get("rename"):
+        df = df.rename(columns=out["rename"])
+    return apply_transforms(df, [t for t in out.get("transforms") or [] if t not in (applied or ())])
+
+def _optimize_opts(exp: Dict, out: Dict) -> Dict:
+    opt = out.get("optimize", exp.get("optimize"))
+    if opt is True:
+        return {"dropEmptyColumns": True, "trimEmptyRows": True}
+    return opt if isinstance(opt, dict) else {}
+
+def _cells(shape) -> int:
+    return (shape[0] + 1) * shape[1]  # + header row
+
+def optimize_frame(df: pd.DataFrame, opt: Dict, label: str = "",
+                   warn: bool = True, report: bool = True) -> pd.DataFrame:
+    """
+    "optimize": {"columns": [...], "dropEmptyColumns": true, "trimEmptyRows": true}
+    (or just true for both drops) on an export or a derived output. Shrinks what is
+    uploaded — Sheets cost scales with cells, not rows — and reports cells before/after.
+    Unknown "columns" are reported like project_columns does.
+    """
+    if not opt:
+        return df
+    before = df.shape
+    if opt.get("columns"):
+        by_norm = {_norm_col(c): c for c in df.columns}
+        keep = [by_norm.get(_norm_col(c)) for c in opt["columns"]]
+        missing = [c for c, k in zip(opt["columns"], keep) if k is None]
+        if missing and warn:
+            print(f"[warn] {label or 'optimize'}: optimize columns not in output: {', '.join(map(str, missing))}")
+        df = df[[c for c in dict.fromkeys(keep) if c is not None]]
+    if opt.get("dropEmptyColumns") or opt.get("trimEmptyRows"):
+        blank = df.isna() | df.apply(lambda col: col.astype(str).str.strip().eq(""))
+        if opt.get("dropEmptyColumns"):
+            df = df.loc[:, ~blank.all(axis=0)]
+            blank = blank.loc[:, df.columns]
+        if opt.get("trimEmptyRows") and len(df):
+            filled = (~blank.all(axis=1)).to_numpy().nonzero()[0]
+            df = df.iloc[:filled[-1] + 1 if len(filled) else 0]
+    if label and report and df.shape != before:
+        print(f"[info] {label}: optimized {before[0]:,}x{before[1]} → {len(df):,}x{len(df.columns)} "
+              f"({_cells(before):,} → {_cells(df.shape):,} cells)")
+    return df
+
+def publish_frame(df: pd.DataFrame, exp: Dict, collect=None) -> bool:
+    """
+    Transform the source frame once, then write every output tab projected from it.
+    `collect(tab, df)`, if given, sees each projected output (used by the join stage).
+    Returns True only if every output was written. An ExportStream is published batch
+    by batch instead (see publish_stream).
+    """
+    with METRICS.phase(f"publish:{exp.get('name', 'Unnamed')}"):
+        if isinstance(df, ExportStream):
+            return publish_stream(df, exp, collect)
+        return _publish_frame(df, exp, collect)
+
+def _publish_frame(df: pd.DataFrame, exp: Dict, collect=None) -> bool:
+    name = exp.get("name", "Unnamed")
+    METRICS.add("rows", len(df))
+    df = apply_transforms(df, exp.get("transforms", DEFAULT_TRANSFORMS))
+    CHECKPOINT.mark(export_key(exp), "transformed")
+
+    outs = export_outputs(exp)
+    if not outs:
+        print(f"[warn] {name}: no 'tab' or 'derived' outputs configured")
+    ok = bool(outs)
+    for out in outs:
+        tab = out["tab"]
+        try:
+            out_df = project_columns(df, out, applied=exp.get("transforms", DEFAULT_TRANSFORMS))
+        except Exception as e:
+            ok = False
+            print(f"[error] failed to build '{tab}' for {name}: {e}")
+            continue
+        if collect:
+            collect(tab, out_df)
+        out_df = optimize_frame(out_df, _optimize_opts(exp, out), f"{name} → '{tab}'")
+        ok = write_sinks(out_df, output_sinks(exp, out), f"{name} → '{tab}'") and ok
+    return ok
+
+# ===================== OUTPUT SINKS =====================
+def _sink_path(spec: Dict) -> Path:
+    if not spec.get("path"):
+        raise ValueError(f"{spec['type']} sink needs a 'path'")
+    path = Path(spec["path"])
+    if not path.is_absolute():
+        path = Path(__file__).parent / path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+def _sink_sheets(df: pd.DataFrame, spec: Dict):
+    shards = plan_shards(df, spec)
+    if shards is None:
+        overwrite_tab(df, spec["tab"])
+        drop_shards(spec)
+    else:
+        write_shards(shards, spec)
+
+def _sink_csv(df: pd.DataFrame, spec: Dict):
+    df.to_csv(_sink_path(spec), index=False)
+
+def _sink_parquet(df: pd.DataFrame, spec: Dict):
+    df.to_parquet(_sink_path(spec), index=False)
+
+def _sink_sqlite(df: pd.DataFrame, spec: Dict):
+    import sqlite3
+    con = sqlite3.connect(_sink_path(spec), timeout=30)
+    try:
+        df.to_sql(spec.get("table") or spec["tab"], con, if_exists="replace", index=False)
+        con.commit()
+    finally:
+        con.close()
+
+def _sink_arrow(df: pd.DataFrame, spec: Dict):
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(str(_sink_path(spec)), "wb") as fh, pa.ipc.new_file(fh, table.schema) as writer:
+        writer.write_table(table)
+
+SINKS = {
+    "sheets":  _sink_sheets,
+    "csv":     _sink_csv,
+    "parquet": _sink_parquet,
+    "sqlite":  _sink_sqlite,
+    "arrow":   _sink_arrow,
+}
+
+def output_sinks(exp: Dict, out: Dict) -> List[Dict]:
+    """
+    "sinks": [{"type": "sheets"}, {"type": "csv", "path": "out/{tab}.csv"},
+              {"type": "sqlite", "path": "out/arms.db", "table": "{tab}"}, ...]
+    Set on a derived output or on the export (applies to all of its outputs);
+    the default is Sheets only. "{tab}" and "{name}" are filled in per output.
+    """
+    specs = out.get("sinks") or exp.get("sinks") or [{"type": "sheets"}]
+    fill = {"tab": out["tab"], "name": exp.get("name", "Unnamed")}
+    resolved = []
+    for spec in specs:
+        spec = {k: (v.format(**fill) if isinstance(v, str) else v) for k, v in spec.items()}
+        spec.setdefault("tab", out["tab"])
+        if spec.get("type") == "sheets" and (out.get("shard") or exp.get("shard")):
+            spec.setdefault("shard", out.get("shard") or exp.get("shard"))
+        resolved.append(spec)
+    return resolved
+
+def write_sinks(df: pd.DataFrame, specs: List[Dict], label: str) -> bool:
+    """Write df to every sink concurrently; one sink failing doesn't stop the others."""
+    def _one(spec):
+        fn = SINKS.get(spec.get("type", ""))
+        if fn is None:
+            raise ValueError(f"unknown sink type '{spec.get('type')}'")
+        t0 = time.perf_counter()
+        fn(df, spec)
+        return time.perf_counter() - t0
+
+    ok = True
+    with ThreadPoolExecutor(max_workers=max(1, len(specs))) as pool:
+        futs = [(spec, pool.submit(_one, spec)) for spec in specs]
+        for spec, fut in futs:
+            where = spec.get("path") or spec["tab"]
+            try:
+                secs = fut.result()
+                print(f"[info] {label}: wrote {len(df):,} rows x {len(df.columns)} cols to {spec['type']} '{where}' in {secs:.1f}s")
+            except Exception as e:
+                ok = False
+                print(f"[error] {label}: {spec.get('type')} sink '{where}' failed: {e}")
+    return ok
+
+# ===================== SHARDING =====================
+# "shard": {"maxRows": 200000} splits a Sheets output into Tab_1..Tab_n worksheets;
+# "by": "Grad. Year" makes one shard per key value (Tab_2027, ...), split further
+# when a value exceeds maxRows. "spreadsheets" / "spreadsheetsEnv" list target
+# spreadsheet IDs (literal / env var names), assigned round-robin, since the 10M-cell
+# cap is per spreadsheet. Without a "shard" block, outputs over SHEETS_SHARD_CELLS roll
+# over into SHEET_ID + SHEETS_SHARD_SPREADSHEETS (comma-separated IDs); with no extra
+# spreadsheets they stay one tab, and anything over the cap is refused. The
+# "{tab}_manifest" tab in SHEET_ID lists every shard (for downstream formulas) and
+# "{tab}" itself becomes a pointer to it; shards from the previous manifest that no
+# longer exist are removed, and going back to one tab removes the shards and manifest.
+SHEETS_CELL_LIMIT    = 10_000_000  # per spreadsheet, across all its tabs
+SHEETS_SHARD_CELLS   = int(os.getenv("SHEETS_SHARD_CELLS", "5000000"))
+SHEETS_SHARD_SPREADSHEETS = [x.strip() for x in os.getenv("SHEETS_SHARD_SPREADSHEETS", "").split(",") if x.strip()]
+SHEETS_SHARD_WORKERS = int(os.getenv("SHEETS_SHARD_WORKERS", "3"))
+MANIFEST_HEADER = ["Shard", "Spreadsheet", "Key", "Rows", "First Row", "Last Row", "Updated"]
+
+def _shard_title(s: str) -> str:
+    return re.sub(r"[\[\]:*?/\\']+", "_", s)[:100]
+
+def plan_shards(df: pd.DataFrame, spec: Dict) -> Optional[List[Dict]]:
+    """Split df per the spec's "shard" block → [{"tab", "sheet", "key", "df", "first"}], or None for one tab."""
+    cfg, tab = spec.get("shard") or {}, spec["tab"]
+    cols = max(1, len(df.columns))
+    cells = (len(df) + 1) * cols
+    auto = not cfg
+    if auto:
+        if cells <= SHEETS_SHARD_CELLS:
+            return None
+        if not SHEETS_SHARD_SPREADSHEETS:
+            if cells > SHEETS_CELL_LIMIT:
+                raise ValueError(f"'{tab}': {len(df):,}x{cols} is over the {SHEETS_CELL_LIMIT:,}-cell spreadsheet cap; "
+                                 f"add a \"shard\" block with \"spreadsheets\" or set SHEETS_SHARD_SPREADSHEETS")
+            return None  # more tabs in the same spreadsheet wouldn't raise the cap
+        cfg = {"spreadsheets": [SHEET_ID] + SHEETS_SHARD_SPREADSHEETS}
+    max_rows = int(cfg.get("maxRows") or max(1, SHEETS_SHARD_CELLS // cols - 1))
+    sheets = list(cfg.get("spreadsheets") or []) + [os.getenv(v, "") for v in cfg.get("spreadsheetsEnv") or []]
+    sheets = [x for x in sheets if x] or [SHEET_ID]
+
+    groups = [("", df)]
+    key = cfg.get("by")
+    if key:
+        if key not in df.columns:
+            raise ValueError(f"shard key '{key}' is not a column of '{tab}'")
+        vals = df[key].fillna("").astype(str).str.strip().replace("", "blank")
+        groups = [(k, df[vals == k]) for k in sorted(vals.unique())]
+
+    shards, first = [], 1
+    for k, g in groups:
+        parts = [g.iloc[i:i + max_rows] for i in range(0, len(g), max_rows)] or [g]
+        for j, part in enumerate(parts):
+            suffix = "_".join(x for x in (k, str(j + 1) if len(parts) > 1 or not k else "") if x)
+            shards.append({"tab": _shard_title(f"{tab}_{suffix}"), "key": k,
+                           "df": part, "first": first})
+            first += len(part)
+    load: Dict[str, int] = {}
+    for i, sh in enumerate(shards):
+        sh["sheet"] = sheets[i % len(sheets)]
+        load[sh["sheet"]] = load.get(sh["sheet"], 0) + (len(sh["df"]) + 1) * cols
+    full = max(load.values())
+    if full > SHEETS_CELL_LIMIT:
+        raise ValueError(f"'{tab}': {len(shards)} shard(s) put {full:,} cells in one spreadsheet "
+                         f"(cap {SHEETS_CELL_LIMIT:,}); list more spreadsheets to shard across")
+    if auto:
+        print(f"[info] '{tab}': {len(df):,}x{cols} is over SHEETS_SHARD_CELLS — sharding into {len(shards)} tabs "
+              f"across {len(load)} spreadsheet(s)")
+    return shards
+
+def _manifest_tab(spec: Dict) -> str:
+    return (spec.get("shard") or {}).get("manifest") or f"{spec['tab']}_manifest"
+
+def _remove_shards(gc, tab: str, rows: List[List[str]], keep=frozenset()):
+    """Delete the shard tabs listed in manifest rows, except (sheet, tab) pairs in keep."""
+    for old in rows:
+        if len(old) < 2 or (old[1], old[0]) in keep or old[0] == tab:
+            continue
+        try:
+            sh = sheets_call(gc.open_by_key, old[1], what="open")
+            sheets_call(sh.del_worksheet, sheets_call(sh.worksheet, old[0], what="worksheet"), what="del_worksheet")
+            print(f"[info] '{tab}': removed stale shard '{old[0]}'")
+        except Exception as e:
+            print(f"[warn] '{tab}': couldn't remove stale shard '{old[0]}': {e}")
+
+_UNSHARDED: set = set()  # tabs already known to have no manifest in this process
+
+def drop_shards(spec: Dict):
+    """After an output goes back to one tab, delete its old shards and manifest."""
+    import gspread
+    tab, manifest_tab = spec["tab"], _manifest_tab(spec)
+    if manifest_tab in _UNSHARDED:
+        return
+    gc = _gs_client()
+    home = sheets_call(gc.open_by_key, SHEET_ID, what="open")
+    try:
+        ws = sheets_call(home.worksheet, manifest_tab, what="worksheet")
+    except gspread.exceptions.WorksheetNotFound:
+        _UNSHARDED.add(manifest_tab)
+        return
+    _remove_shards(gc, tab, sheets_call(ws.get_all_values, what="read manifest")[1:])
+    sheets_call(home.del_worksheet, ws, what="del_worksheet")
+    _UNSHARDED.add(manifest_tab)
+    print(f"[info] '{tab}': back to one tab — removed '{manifest_tab}'")
+
+def write_shards(shards: List[Dict], spec: Dict):
+    """Upload shards in parallel, then rewrite the manifest and drop shards it no longer lists."""
+    import gspread
+    import pandas as pd
+    tab, manifest_tab = spec["tab"], _manifest_tab(spec)
+    gc = _gs_client()
+    home = sheets_call(gc.open_by_key, SHEET_ID, what="open")
+    try:
+        previous = sheets_call(sheets_call(home.worksheet, manifest_tab, what="worksheet").get_all_values,
+                               what="read manifest")[1:]
+    except gspread.exceptions.WorksheetNotFound:
+        previous = []
+
+    now = datetime.now().isoformat(timespec="seconds")
+    pointer = pd.DataFrame([[f"Sharded into {len(shards)} tabs — see '{manifest_tab}'", now]],
+                           columns=["Note", "Updated"])
+    if any(sh["sheet"] == SHEET_ID for sh in shards):
+        # shrink the old single {tab} first: next to the home shards it can push the
+        # spreadsheet over the 10M-cell cap (typically the run that first shards it)
+        overwrite_tab(pointer, tab)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(SHEETS_SHARD_WORKERS, len(shards)))) as pool:
+        futs = [(sh, pool.submit(overwrite_tab, sh["df"], sh["tab"], sh["sheet"])) for sh in shards]
+        for sh, fut in futs:
+            fut.result()  # re-raise the first shard failure; the old manifest stays valid
+    print(f"[info] '{tab}': wrote {len(shards)} shard(s) across {len({sh['sheet'] for sh in shards})} spreadsheet(s)")
+
+    rows = [[sh["tab"], sh["sheet"], sh["key"], len(sh["df"]), sh["first"], sh["first"] + len(sh["df"]) - 1, now]
+            for sh in shards]
+    overwrite_tab(pd.DataFrame(rows, columns=MANIFEST_HEADER), manifest_tab)
+    _UNSHARDED.discard(manifest_tab)
+    if all(sh["sheet"] != SHEET_ID for sh in shards):
+        overwrite_tab(pointer, tab)  # the unsharded rows would otherwise linger in {tab}, looking current
+
+    _remove_shards(gc, tab, previous, keep={(sh["sheet"], sh["tab"]) for sh in shards})
+
+# ===================== STREAMING =====================
+# STREAM_BATCH_ROWS=N (or "streamRows": N on an export) reads the downloaded CSV in
+# N-row batches, transforms each batch and appends it to every output as it goes,
+# so peak memory is bounded by the batch rather than the whole export.
+# Only sinks that can append (sheets, csv) stream; any other sink in the export
+# makes it fall back to the in-memory path.
+STREAM_BATCH_ROWS = int(os.getenv("STREAM_BATCH_ROWS", "0"))
+
+def stream_rows(exp: Dict) -> int:
+    return int(exp.get("streamRows") or STREAM_BATCH_ROWS or 0)
+
+class ExportStream:
+    """A downloaded export that is read lazily in row batches; stands in for its DataFrame."""
+    def __init__(self, path: Path, layout_text: str, rows: int):
+        self.path, self.layout_text, self.rows = Path(path), layout_text, rows
+
+    @property
+    def empty(self) -> bool:
+        with open(self.path, "rb") as fh:
+            fh.readline()
+            return not fh.readline().strip()
+
+    def batches(self):
+        import pandas as pd
+        try:
+            reader = pd.read_csv(self.path, dtype=str, encoding="utf-8-sig", chunksize=self.rows)
+        except Exception:
+            reader = pd.read_csv(self.path, dtype=str, chunksize=self.rows)
+        with reader:
+            for i, batch in enumerate(reader):
+                if i == 0:
+                    remember_layout_columns(self.layout_text, list(batch.columns))
+                yield batch
+
+class _SheetsAppender:
+    """Clears the tab once, then writes header + batches range by range, growing the grid as needed."""
+    def __init__(self, spec: Dict):
+        import gspread
+        sh = sheets_call(_gs_client().open_by_key, SHEET_ID, what="open")
+        try:
+            self.ws = sheets_call(sh.worksheet, spec["tab"], what="worksheet")
+        except gspread.exceptions.WorksheetNotFound:
+            self.ws = sheets_call(sh.add_worksheet, title=spec["tab"], rows=100, cols=26, what="add_worksheet")
+        sheets_call(self.ws.clear, what="clear")
+        self.next_row = 1
+
+    def write(self, df: pd.DataFrame):
+        rows = _frame_values(df)
+        if self.next_row == 1:
+            rows = [[str(c) for c in df.columns]] + rows
+        if not rows:
+            return
+        sheets_call(self.ws.resize, rows=self.next_row + len(rows) - 1, cols=max(1, len(df.columns)), what="resize")
+        write_rows(self.ws, rows, start_row=self.next_row)
+        self.next_row += len(rows)
+
+    def close(self):
+        pass
+
+class _CsvAppender:
+    def __init__(self, spec: Dict):
+        self.fh = open(_sink_path(spec), "w", newline="", encoding="utf-8")
+        self.header = True
+
+    def write(self, df: pd.DataFrame):
+        df.to_csv(self.fh, index=False, header=self.header)
+        self.header = False
+
+    def close(self):
+        self.fh.close()
+
+STREAM_SINKS = {
+    "sheets": _SheetsAppender,
+    "csv":    _CsvAppender,
+}
+
+def open_export(path: Path, layout_text: str, exp: Dict):
+    """The downloaded export as a DataFrame, or as an ExportStream when streaming is on for it."""
+    rows = stream_rows(exp)
+    if rows > 0:
+        specs = [spec for out in export_outputs(exp) for spec in output_sinks(exp, out)]
+        kinds = {spec.get("type") for spec in specs}
+        if any(spec.get("shard") for spec in specs):
+            kinds.add("sharded sheets")
+        if kinds <= set(STREAM_SINKS):
+            return ExportStream(path, layout_text, rows)
+        print(f"[info] {exp.get('name', 'Unnamed')}: sinks {sorted(kinds - set(STREAM_SINKS))} can't stream — reading the whole export")
+    return read_export_csv(path, layout_text)
+
+def publish_stream(stream: ExportStream, exp: Dict, collect=None) -> bool:
+    """
+    publish_frame for an ExportStream: every batch is transformed, projected to each
+    output and appended to that output's sinks. A sink that fails stops receiving
+    batches; the others carry on. Batches are offered to `collect` with append=True.
+    """
+    name = exp.get("name", "Unnamed")
+    outs = export_outputs(exp)
+    if not outs:
+        print(f"[warn] {name}: no 'tab' or 'derived' outputs configured")
+        return False
+    t0 = time.perf_counter()
+    writers: Dict[tuple, object] = {}   # (tab, sink index) → appender, None once failed
+    columns: Dict[str, List] = {}       # tab → columns of its first batch
+    shapes: Dict[str, List[int]] = {}   # tab → [rows, columns before optimize, columns after]
+    rows, ok = 0, True
+
+    def _fail(key, label, e):
+        nonlocal ok
+        ok = False
+        writers[key] = None
+        print(f"[error] {label} failed: {e}")
+
+    for i, batch in enumerate(stream.batches()):
+        METRICS.add("rows", len(batch))
+        batch = apply_transforms(batch, exp.get("transforms", DEFAULT_TRANSFORMS))
+        if i == 0:
+            CHECKPOINT.mark(export_key(exp), "transformed")
+        rows += len(batch)
+        for out in outs:
+            tab = out["tab"]
+            try:
+                full = project_columns(batch, out, warn=i == 0, applied=exp.get("transforms", DEFAULT_TRANSFORMS))
+                full = full.reindex(columns=columns.setdefault(tab, list(full.columns)))
+                # a batch can't tell whether a column or the tail is empty overall
+                out_df = optimize_frame(full, {"columns": _optimize_opts(exp, out).get("columns")},
+                                        f"{name} → '{tab}'", warn=i == 0, report=False)
+            except Exception as e:
+                ok = False
+                print(f"[error] failed to build '{tab}' for {name}: {e}")
+                continue
+            shape = shapes.setdefault(tab, [0, full.shape[1], out_df.shape[1]])
+            shape[0] += len(out_df)
+            if collect:
+                collect(tab, full, append=i > 0)
+            for j, spec in enumerate(output_sinks(exp, out)):
+                key, label = (tab, j), f"{name} → '{tab}': {spec['type']} sink '{spec.get('path') or tab}'"
+                if key in writers and writers[key] is None:
+                    continue
+                try:
+                    if key not in writers:
+                        writers[key] = STREAM_SINKS[spec["type"]](spec)
+                    writers[key].write(out_df)
+                except Exception as e:
+                    _fail(key, label, e)
+        print(f"[info] {name}: streamed batch {i + 1} ({rows:,} rows so far)", flush=True)
+
+    for key, w in writers.items():
+        try:
+            if w is not None: w.close()
+        except Exception as e:
+            _fail(key, f"{name} → '{key[0]}'", e)
+    for tab, (n, before, after) in shapes.items():
+        if before != after:
+            print(f"[info] {name} → '{tab}': optimized {n:,}x{before} → {n:,}x{after} "
+                  f"({_cells((n, before)):,} → {_cells((n, after)):,} cells)")
+    print(f"[info] {name}: streamed {rows:,} rows to {len(outs)} output(s) in {time.perf_counter() - t0:.1f}s")
+    return ok
+
+# ===================== RECRUIT JOIN =====================
+def _norm_key(s: pd.Series) -> pd.Series:
+    return (s.fillna("").astype(str).str.normalize("NFKC").str.lower()
+             .str.replace(r"\s+", " ", regex=True).str.strip())
+
+def join_frames(frames: List[tuple], keys: List[str], how: str = "outer") -> pd.DataFrame:
+    """
+    Merge [(tab, df), ...] on normalized `keys` (case/whitespace/Unicode-insensitive).
+    pandas merge is a hash join on the combined key. Each source is deduped on the
+    key first, so the result has one row per recruit. A column that appears in
+    several sources is coalesced: the earlier source wins and blanks are filled
+    from later ones.
+    """
+    import pandas as pd
+
+    def _keyed(tab, df):
+        missing = [k for k in keys if k not in df.columns]
+        if missing:
+            raise ValueError(f"'{tab}' lacks join key column(s): {', '.join(missing)}")
+        df = df.copy()
+        parts = [_norm_key(df[k]) for k in keys]
+        df["__key"] = parts[0].str.cat(parts[1:], sep="\x1f") if len(parts) > 1 else parts[0]
+        blank = (pd.concat(parts, axis=1) == "").any(axis=1)
+        dup = df.duplicated("__key") & ~blank
+        if blank.any() or dup.any():
+            print(f"[warn] join: '{tab}' dropped {int(blank.sum())} blank-key and {int(dup.sum())} duplicate-key rows")
+        return df[~blank & ~dup]
+
+    (tab0, df0), rest = frames[0], frames[1:]
+    master = _keyed(tab0, df0)
+    for tab, df in rest:
+        df = _keyed(tab, df)
+        shared = [c for c in df.columns if c != "__key" and c in master.columns]
+        master = master.merge(df, on="__key", how=how, suffixes=("", " __dup"))
+        for c in shared:
+            dup_col = f"{c} __dup"
+            master[c] = master[c].where(master[c].notna() & (master[c] != ""), master[dup_col])
+            master = master.drop(columns=dup_col)
+    return master.drop(columns="__key").reset_index(drop=True)
+
+JOIN_SOURCES_DIR = Path(__file__).with_name(".join_sources")
+
+class JoinStage:
+    """
+    "joins": [{"tab": "Master_27", "key": ["Full Name", "Grad. Year"],
+               "sources": ["Raw_Contact_27", "Raw_Socials_27"], "how": "outer", "sinks": [...]}]
+    Holds on to the outputs named in "sources" while the run publishes them,
+    then writes one pre-joined master table per join at the end of the run.
+    Every fresh source frame is also kept in JOIN_SOURCES_DIR, so a source whose
+    export was skipped (unchanged probe, already written) joins from its last copy.
+    A join is rebuilt only when at least one of its sources is fresh.
+    The daemon keeps the latest frame of each source across cycles (fresh_only
+    skips the joins none of this cycle's exports fed).
+    """
+    def __init__(self, joins: List[Dict]):
+        self.joins = joins
+        self.wanted = {t for j in joins for t in j.get("sources", [])}
+        self.frames: Dict[str, pd.DataFrame] = {}
+        self.fresh: set = set()
+        self.lock = threading.Lock()
+
+    def offer(self, tab: str, df: pd.DataFrame, append: bool = False):
+        """`append` adds a streamed batch to what this run already offered for the tab."""
+        if tab in self.wanted:
+            import pandas as pd
+            with self.lock:
+                if append and tab in self.frames:
+                    df = pd.concat([self.frames[tab], df], ignore_index=True)
+                self.frames[tab] = df
+                self.fresh.add(tab)
+
+    @staticmethod
+    def _kept_path(tab: str) -> Path:
+        tenant = re.sub(r"[^\w-]+", "", os.getenv("ARMS_TENANT", ""))
+        name = re.sub(r"[^\w.-]+", "_", tab)
+        return JOIN_SOURCES_DIR / f"{tenant + '-' if tenant else ''}{name}.parquet"
+
+    def _keep(self, tabs):
+        JOIN_SOURCES_DIR.mkdir(parents=True, exist_ok=True)
+        for tab in tabs:
+            try:
+                self.frames[tab].to_parquet(self._kept_path(tab), index=False)
+            except Exception as e:
+                print(f"[warn] couldn't keep a copy of join source '{tab}': {e}")
+
+    def _load_kept(self, tab: str) -> bool:
+        import pandas as pd
+        path = self._kept_path(tab)
+        if not path.exists():
+            return False
+        try:
+            self.frames[tab] = pd.read_parquet(path)
+        except Exception as e:
+            print(f"[warn] couldn't read the kept copy of join source '{tab}': {e}")
+            return False
+        print(f"[info] join source '{tab}' unchanged — using its copy from "
+              f"{datetime.fromtimestamp(path.stat().st_mtime):%Y-%m-%d %H:%M}")
+        return True
+
+    def run(self, fresh_only: bool = False) -> List[str]:
+        failed = []
+        with self.lock:
+            fresh, self.fresh = self.fresh, set()
+        self._keep(fresh)
+        for j in self.joins:
+            tab = j.get("tab")
+            sources = j.get("sources") or []
+            if not fresh.intersection(sources):
+                if not fresh_only and tab:
+                    print(f"[info] join '{tab}': no source changed — left as is")
+                continue
+            keys = [j["key"]] if isinstance(j.get("key"), str) else list(j.get("key") or [])
+            if not tab or len(sources) < 2 or not keys:
+                print(f"[warn] join needs 'tab', 'key' and at least two 'sources': {j}")
+                continue
+            missing = [t for t in sources if t not in self.frames and not self._load_kept(t)]
+            if missing:
+                print(f"[warn] join '{tab}' skipped — no fresh or kept data for: {', '.join(missing)}")
+                continue
+            t0 = time.perf_counter()
+            try:
+                master = join_frames([(t, self.frames[t]) for t in sources], keys, j.get("how", "outer"))
+            except Exception as e:
+                failed.append(f"join {tab}: {e}")
+                print(f"[error] join '{tab}' failed: {e}")
+                continue
+            print(f"[info] join '{tab}': {len(master):,} recruits from {len(sources)} sources in {time.perf_counter() - t0:.1f}s")
+            METRICS.record(f"join:{tab}", time.perf_counter() - t0)
+            if not write_sinks(master, output_sinks({"name": tab, "sinks": j.get("sinks")}, {"tab": tab}), f"join '{tab}'"):
+                failed.append(f"join {tab}")
+        return failed
+
+# ===================== CHECKPOINT / RESUME =====================
+DOWNLOAD_DIR         = Path(__file__).with_name(".downloads")
+CHECKPOINT_MAX_AGE_H = float(os.getenv("CHECKPOINT_MAX_AGE_H", "6"))  # older checkpoints are ignored
+
+class Checkpoint:
+    """
+    Per-export stage of the current run (filtered → submitted → downloaded →
+    transformed → written), persisted after every step. A later process resumes
+    from the entries the previous run left behind. It skips written exports,
+    re-reads downloaded files and goes back to polling submitted jobs. Entries
+    this process wrote itself are never "resumed".
+    """
+    def __init__(self):
+        self.run_id = f"{os.getpid()}-{time.time():.0f}"
+        self._d: Optional[Dict] = None
+        self.lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        tenant = re.sub(r"[^\w-]+", "", os.getenv("ARMS_TENANT", ""))
+        return Path(__file__).with_name(f".run_checkpoint{'-' + tenant if tenant else ''}.json")
+
+    @property
+    def d(self) -> Dict:
+        if self._d is None:
+            d = _read_json(self.path)
+            try:
+                age_h = (datetime.now() - datetime.fromisoformat(d["updated"])).total_seconds() / 3600
+            except Exception:
+                age_h = None
+            self._d = d if age_h is not None and age_h <= CHECKPOINT_MAX_AGE_H else {"exports": {}}
+        return self._d
+
+    def resume_point(self, key: str) -> Dict:
+        e = self.d.get("exports", {}).get(key) or {}
+        return e if e.get("run") != self.run_id else {}
+
+    def mark(self, key: str, stage: str, **info):
+        with self.lock:
+            e = self.d.setdefault("exports", {}).setdefault(key, {})
+            e.update(info, stage=stage, run=self.run_id, at=datetime.now().isoformat(timespec="seconds"))
+            self.d["updated"] = e["at"]
+            _write_json(self.path, self.d)
+
+    def stage(self, key: str) -> Optional[str]:
+        return (self.d.get("exports", {}).get(key) or {}).get("stage")
+
+    def clear(self, keys: List[str]):
+        """Forget finished exports (and their downloads); drop the file once nothing is left."""
+        with self.lock:
+            exports = self.d.get("exports", {})
+            for k in keys:
+                e = exports.pop(k, None) or {}
+                try:
+                    if e.get("path"): Path(e["path"]).unlink()
+                except OSError:
+                    pass
+            if exports:
+                _write_json(self.path, self.d)
+            else:
+                try: self.path.unlink()
+                except OSError: pass
+
+CHECKPOINT = Checkpoint()
+
+def prune_downloads():
+    """Delete kept downloads too old for any checkpoint to resume from (the dir is shared by tenants)."""
+    cutoff = time.time() - CHECKPOINT_MAX_AGE_H * 3600
+    for f in DOWNLOAD_DIR.glob("*") if DOWNLOAD_DIR.exists() else []:
+        try:
+            if f.is_file() and f.stat().st_mtime < cutoff:
+                f.unlink()
+        except OSError:
+            pass
+
+# ===================== CHANGE PROBE =====================
+PROBE_PATH = Path(__file__).with_name(".probe_cache.json")
+PROBE_MAX_AGE_H = float(os.getenv("PROBE_MAX_AGE_H", "24"))  # force a real export at least this often
+
+_TOTAL_KEYS = {"total", "totalcount", "totalrecords", "totalitems", "totalresults", "recordcount"}
+_UPDATED_RX = re.compile(r"updated|modified|lastupdate|changed", re.I)
+
+class RecruitsProbe:
+    """
+    Cheap change signal for the Recruits grid: while filters are applied, watch the
+    grid's JSON XHR responses (those carrying a list of records) for the total next
+    to that list and the newest update timestamp among the records. The timestamp is
+    only kept when the response holds every record: the newest stamp on one page says
+    nothing about edits on the others, so a paged grid gives a count-only signature.
+    Falls back to the paginator text ("1 – 50 of 1,234") for the count.
+    """
+    def __init__(self, page):
+        self.page = page
+        self.total: Optional[int] = None
+        self.latest: Optional[str] = None
+
+    def attach(self):
+        self.page.on("response", self._on_response)
+
+    def detach(self):
+        try: self.page.remove_listener("response", self._on_response)
+        except Exception: pass
+
+    async def _on_response(self, resp):
+        try:
+            if resp.request.resource_type not in ("xhr", "fetch"):
+                return
+            if "json" not in (resp.headers.get("content-type") or ""):
+                return
+            body = await resp.json()
+        except Exception:
+            return
+        found = _find_records(body)
+        if not found:
+            return  # not a grid response
+        total, stamps = _find_total(body, found[0]), []
+        complete = total is not None and len(found[1]) >= total
+
+        def _walk(o, depth=0):
+            if depth > 3: return
+            if isinstance(o, dict):
+                for k, v in o.items():
+                    if isinstance(v, str) and _UPDATED_RX.search(str(k)) and re.match(r"\d{4}-\d{2}-\d{2}", v):
+                        stamps.append(v)
+                    elif isinstance(v, (dict, list)):
+                        _walk(v, depth + 1)
+            elif isinstance(o, list):
+                for v in (o if depth == 0 else o[:500]):
+                    _walk(v, depth + 1)
+
+        if complete:
+            _walk(found[1])
+        # The last grid response after the filters settle describes the filtered set.
+        if total is not None:
+            self.total = total
+            self.latest = max(stamps) if stamps else None
+
+    async def signature(self) -> Dict:
+        try: await settle(self.page)
+        except Exception: pass
+        if self.total is None:
+            try:
+                txt = await self.page.locator(".mat-paginator-range-label, .k-pager-info").first.inner_text(timeout=1500)
+                m = re.search(r"of\s+([\d,]+)", txt)
+                if m: self.total = int(m.group(1).replace(",", ""))
+            except Exception:
+                pass
+        return {"total": self.total, "latest": self.latest}
+
+def probe_unchanged(key: str, sig: Dict, exp: Dict) -> bool:
+    """
+    True when the stored signature from the last successful run matches.
+    A count alone can't see edits, so it is only trusted with "skipIfUnchanged": "count".
+    """
+    if sig.get("total") is None:
+        return False
+    if sig.get("latest") is None and exp.get("skipIfUnchanged") != "count":
+        return False
+    prev = _read_json(PROBE_PATH).get(key) or {}
+    try:
+        age_h = (datetime.now() - datetime.fromisoformat(prev["at"])).total_seconds() / 3600
+    except Exception:
+        return False
+    if age_h > PROBE_MAX_AGE_H:
+        return False
+    return prev.get("total") == sig["total"] and prev.get("latest") == sig.get("latest")
+
+def remember_probe(key: str, sig: Dict):
+    if sig.get("total") is None:
+        return
+    d = _read_json(PROBE_PATH)
+    d[key] = {**sig, "at": datetime.now().isoformat(timespec="seconds")}
+    _write_json(PROBE_PATH, d)
+
+# ===================== GRID API ENGINE =====================
+EXTRACT_ENGINE      = os.getenv("EXTRACT_ENGINE", "export")  # "export" (ARMS job) or "api" (grid XHR)
+GRID_PAGE_SIZE      = int(os.getenv("GRID_PAGE_SIZE", "500"))
+GRID_CONCURRENCY    = int(os.getenv("GRID_CONCURRENCY", "6"))
+GRID_MIN_COVERAGE   = float(os.getenv("GRID_MIN_COVERAGE", "1.0"))  # share of layout columns the API must supply
+LAYOUT_COLUMNS_PATH = Path(__file__).with_name(".layout_columns.json")
+
+_PAGE_KEYS   = {"page", "pagenumber", "pageindex", "currentpage", "pageno"}
+_OFFSET_KEYS = {"skip", "offset", "start", "startindex", "from"}
+_SIZE_KEYS   = {"pagesize", "size", "limit", "take", "rows", "perpage", "per_page", "length"}
+
+def remember_layout_columns(layout_text: str, cols: List[str]):
+    d = _read_json(LAYOUT_COLUMNS_PATH)
+    if d.get(layout_text) != cols:
+        d[layout_text] = cols
+        _write_json(LAYOUT_COLUMNS_PATH, d)
+
+def layout_columns(layout_text: str, exp: Dict) -> List[str]:
+    """Columns the layout produces: "export.columns" in config, else the last CSV we downloaded."""
+    return exp.get("export", {}).get("columns") or _read_json(LAYOUT_COLUMNS_PATH).get(layout_text) or []
+
+def _find_records(o, path=(), depth=0):
+    """(path, list) of the largest list of dicts inside a JSON body."""
+    best = None
+    if isinstance(o, list) and o and all(isinstance(x, dict) for x in o[:20]):
+        best = (path, o)
+    if isinstance(o, dict) and depth < 4:
+        for k, v in o.items():
+            hit = _find_records(v, path + (k,), depth + 1)
+            if hit and (best is None or len(hit[1]) > len(best[1])):
+                best = hit
+    return best
+
+def _find_total(body, records_path) -> Optional[int]:
+    """The total-count field beside the records list (or in an object enclosing it), innermost first."""
+    containers, o = [body], body
+    for k in records_path[:-1]:
+        o = o.get(k) if isinstance(o, dict) else None
+        containers.append(o)
+    for c in reversed(containers):
+        if isinstance(c, dict):
+            for k, v in c.items():
+                if str(k).lower() in _TOTAL_KEYS and isinstance(v, int) and not isinstance(v, bool):
+                    return v
+    return None
+
+def _dig(o, path):
+    for k in path:
+        o = o.get(k) if isinstance(o, dict) else None
+    return o
+
+class GridRecorder:
+    """Remembers the last grid-looking JSON response (a list of records) and the request behind it."""
+    def __init__(self, page):
+        self.page = page
+        self.hit: Optional[Dict] = None
+
+    def attach(self):
+        self.page.on("response", self._on_response)
+
+    def detach(self):
+        try: self.page.remove_listener("response", self._on_response)
+        except Exception: pass
+
+    async def _on_response(self, resp):
+        try:
+            req = resp.request
+            if req.resource_type not in ("xhr", "fetch") or "json" not in (resp.headers.get("content-type") or ""):
+                return
+            body = await resp.json()
+            found = _find_records(body)
+            if not found:
+                return
+            self.hit = {"url": req.url, "method": req.method, "post": req.post_data,
+                        "headers": await req.all_headers(), "path": found[0],
+                        "n": len(found[1]), "total": _find_total(body, found[0])}
+        except Exception:
+            return
+
+def _paging_keys(params: Dict) -> Optional[Dict]:
+    keys = {str(k).lower(): k for k in params}
+    size_k = next((keys[k] for k in _SIZE_KEYS if k in keys), None)
+    page_k = next((keys[k] for k in _PAGE_KEYS if k in keys), None)
+    off_k  = next((keys[k] for k in _OFFSET_KEYS if k in keys), None)
+    if not size_k or not (page_k or off_k):
+        return None
+    try:
+        return {"size_key": size_k, "page_key": page_k, "offset_key": off_k,
+                "size": int(params[size_k]), "first": int(params[page_k]) if page_k else 0}
+    except (TypeError, ValueError):
+        return None
+
+def grid_paging(hit: Dict) -> Optional[Dict]:
+    """Where the grid request keeps its paging: URL query, JSON body, or a dict nested one level in the body."""
+    q = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(hit["url"]).query))
+    spec = _paging_keys(q)
+    if spec:
+        return {**spec, "where": "query", "body_path": ()}
+    try:
+        body = json.loads(hit["post"] or "")
+    except Exception:
+        return None
+    if not isinstance(body, dict):
+        return None
+    for path, params in [((), body)] + [((k,), v) for k, v in body.items() if isinstance(v, dict)]:
+        spec = _paging_keys(params)
+        if spec:
+            return {**spec, "where": "body", "body_path": path}
+    return None
+
+def _page_request(hit: Dict, spec: Dict, i: int, size: int):
+    def _set(params):
+        params[spec["size_key"]] = size
+        if spec["page_key"]:
+            params[spec["page_key"]] = spec["first"] + i
+        else:
+            params[spec["offset_key"]] = i * size
+
+    if spec["where"] == "query":
+        parts = urllib.parse.urlsplit(hit["url"])
+        q = dict(urllib.parse.parse_qsl(parts.query))
+        _set(q)
+        return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(q))), hit["post"]
+    body = json.loads(hit["post"])
+    _set(_dig(body, spec["body_path"]) if spec["body_path"] else body)
+    return hit["url"], json.dumps(body)
+
+def _col_key(c) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(c).split(".")[-1].lower())
+
+def conform_to_layout(df: pd.DataFrame, layout_text: str, exp: Dict) -> Optional[pd.DataFrame]:
+    """
+    Map API fields onto the layout's columns by normalized name ("firstName" ↔ "First Name").
+    Returns None when coverage is below GRID_MIN_COVERAGE; names are checked, not formats.
+    """
+    import pandas as pd
+    expected = layout_columns(layout_text, exp)
+    if not expected:
+        print(f"[warn] no known column set for '{layout_text}' — run it once via the export job, or set export.columns")
+        return None
+    by_key: Dict[str, str] = {}
+    for c in df.columns:
+        by_key.setdefault(_col_key(c), c)
+    mapping = {e: by_key.get(_col_key(e)) for e in expected}
+    missing = [e for e, m in mapping.items() if m is None]
+    cov = 1 - len(missing) / len(expected)
+    print(f"[info] grid API covers {len(expected) - len(missing)}/{len(expected)} layout columns ({cov:.0%})")
+    if cov < GRID_MIN_COVERAGE:
+        print(f"[warn] grid API is missing: {', '.join(missing[:10])}{' …' if len(missing) > 10 else ''}")
+        return None
+    return pd.DataFrame({e: (df[m] if m else None) for e, m in mapping.items()})
+
+_ID_KEYS = ("id", "recruitid", "personid", "athleteid", "uuid", "guid")
+
+def paging_problem(pages: List[List[Dict]], total: int) -> Optional[str]:
+    """
+    Why the fetched pages can't be trusted as the full result set, or None. Besides the
+    count, a server that ignores the paging parameter returns page 1 again and again,
+    so repeated pages and repeated record ids (or identical records) are rejected too.
+    """
+    n = sum(map(len, pages))
+    if n != total:
+        return f"got {n:,} records, expected {total:,}"
+    firsts = [json.dumps(p[0], sort_keys=True, default=str) for p in pages if p]
+    if len(set(firsts)) != len(firsts):
+        return "pages repeat — the server seems to ignore the paging parameter"
+    records = [rec for p in pages for rec in p]
+    id_key = next((k for k in (records[0] if records else {}) if str(k).lower() in _ID_KEYS), None)
+    seen = ([rec.get(id_key) for rec in records] if id_key
+            else [json.dumps(rec, sort_keys=True, default=str) for rec in records])
+    if len(set(map(str, seen))) != len(seen):
+        return f"{len(seen) - len(set(map(str, seen))):,} duplicate records across pages"
+    return None
+
+async def extract_via_grid_api(page, grid: GridRecorder, layout_text: str, exp: Dict) -> Optional[pd.DataFrame]:
+    """
+    Replay the Recruits grid's own data request (learned from the filtered grid load)
+    with the authenticated context.request. Pages are fetched concurrently, at most
+    GRID_CONCURRENCY at a time. Returns None if anything doesn't line up, so the caller
+    falls back to the ARMS export job.
+    """
+    import pandas as pd
+    hit = grid.hit
+    if not hit:
+        print("[warn] grid API: no grid data response was recorded")
+        return None
+    total = hit["total"] if hit["total"] is not None else hit["n"]
+    spec = grid_paging(hit)
+    if spec is None and total > hit["n"]:
+        print(f"[warn] grid API: can't find paging parameters in {hit['method']} {hit['url']}")
+        return None
+    spec = spec or {"size": max(1, hit["n"]), "where": "none"}
+    headers = {k: v for k, v in hit["headers"].items()
+               if not k.startswith(":") and k.lower() not in ("content-length", "host")}
+    sem = asyncio.Semaphore(max(1, GRID_CONCURRENCY))
+
+    async def _fetch_all(size: int) -> List[List[Dict]]:
+        async def _get(i):
+            url, data = (hit["url"], hit["post"]) if spec["where"] == "none" else _page_request(hit, spec, i, size)
+            async with sem:
+                r = await page.context.request.fetch(url, method=hit["method"], headers=headers, data=data)
+            if not r.ok:
+                raise RuntimeError(f"grid page {i}: HTTP {r.status}")
+            return _dig(await r.json(), hit["path"]) or []
+        n_pages = max(1, -(-total // size))
+        return await asyncio.gather(*[_get(i) for i in range(n_pages)])
+
+    t0 = time.perf_counter()
+    size = max(spec["size"], GRID_PAGE_SIZE) if spec["where"] != "none" else spec["size"]
+    pages = await _fetch_all(size)
+    if sum(map(len, pages)) < total and size != spec["size"]:
+        print(f"[info] grid API: server capped page size {size}; retrying at {spec['size']}")
+        pages = await _fetch_all(spec["size"])
+    problem = paging_problem(pages, total)
+    if problem:
+        print(f"[warn] grid API: {problem}")
+        return None
+    records = [rec for p in pages for rec in p]
+    print(f"[info] grid API: {len(records):,} records in {time.perf_counter() - t0:.1f}s")
+
+    df = pd.json_normalize(records)
+    df = df.astype(object).where(df.notna(), None)
+    df = df.apply(lambda s: s.map(lambda v: v if v is None else str(v)))
+    return conform_to_layout(df, layout_text, exp)
+
+# ===================== UPLOAD PIPELINE =====================
+UPLOAD_WORKERS   = int(os.getenv("UPLOAD_WORKERS", "2"))
+UPLOAD_QUEUE_MAX = int(os.getenv("UPLOAD_QUEUE_MAX", "2"))  # frames waiting; bounds memory
+
+class UploadPipeline:
+    """
+    Runs publish_frame (transforms + Sheets writes) on worker threads fed by a bounded
+    queue, so Playwright keeps driving the next export while uploads are in flight.
+    submit() blocks only when the queue is full. close() drains it and reports failures.
+    """
+    def __init__(self, workers: int = UPLOAD_WORKERS, maxsize: int = UPLOAD_QUEUE_MAX, collect=None):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, maxsize))
+        self.collect = collect
+        self.failures: List[str] = []
+        self.written: List[str] = []
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(max(1, workers))]
+
+    async def submit(self, df: pd.DataFrame, exp: Dict, on_written=None):
+        await self.queue.put((df, exp, on_written))
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.get()
+            try:
+                if item is None:
+                    return
+                df, exp, on_written = item
+                name = exp.get("name", "Unnamed")
+                try:
+                    if await asyncio.to_thread(publish_frame, df, exp, self.collect):
+                        self.written.append(name)
+                        if on_written: on_written()
+                    else:
+                        self.failures.append(name)
+                except Exception as e:
+                    self.failures.append(f"{name}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def drain(self):
+        """Wait until everything submitted so far has been published (or has failed)."""
+        await self.queue.join()
+
+    async def close(self) -> List[str]:
+        for _ in self._workers:
+            await self.queue.put(None)
+        await asyncio.gather(*self._workers)
+        if self.failures:
+            print(f"[error] {len(self.failures)} upload(s) failed: " + "; ".join(self.failures))
+        return self.failures
+
 # ===================== EXPORT FLOW =====================
 
 async def open_right_kebab_and_click_export(page):
@@ -377,7 +2055,8 @@ async def open_right_kebab_and_click_export(page):
     for i in range(await triggers.count()):
         el = triggers.nth(i)
         try:
-            await el.wait_for(timeout=1500)
+            async with candidate("open_right_kebab_and_click_export/trigger", "scan"):
+                await within("export.menu_trigger", 1500, lambda t: el.wait_for(timeout=t))
             box = await el.bounding_box()
             if box and box["y"] < 4000 and box["x"] > right_x:  # ignore weird offscreen nodes
                 right_x, right_idx = box["x"], i
@@ -392,7 +2071,7 @@ async def open_right_kebab_and_click_export(page):
 
         # Wait for an overlay panel that contains a mat menu OR any role=menu
         panel = page.locator(".cdk-overlay-pane:has(.mat-menu-content), [role='menu']").last
-        await panel.wait_for(timeout=3000)
+        await within("export.menu_panel", 3000, lambda t: panel.wait_for(timeout=t))
 
         # Try the most stable locator first, then fallbacks
         candidates = [
@@ -404,13 +2083,15 @@ async def open_right_kebab_and_click_export(page):
             panel.locator("text=Export").first,
         ]
 
-        for el in candidates:
+        for i, el in enumerate(candidates):
             try:
-                if await el.count() and await el.is_visible():
+                async with candidate("open_right_kebab_and_click_export/item", i):
+                    if not (await el.count() and await el.is_visible()):
+                        raise LookupError("not visible")
                     await el.scroll_into_view_if_needed()
-                    await el.click(timeout=1500)
-                    await page.wait_for_load_state("networkidle")
-                    return True
+                    await within("export.menu_item", 1500, lambda t: el.click(timeout=t))
+                await settle(page)
+                return True
             except:
                 continue
 
@@ -433,7 +2114,7 @@ async def open_right_kebab_and_click_export(page):
         # close menu to avoid stale overlay for the next attempt
         try: await page.keyboard.press("Escape")
         except: pass
-        await asyncio.sleep(0.15)
+        await pause(0.15)
         return False
 
     # Try up to 3 times (menus can lose focus in headless)
@@ -447,27 +2128,31 @@ async def open_right_kebab_and_click_export(page):
 
 async def open_export_and_start_job(layout_text: str, page):
     dropdown = None
-    for loc in [
+    for i, loc in enumerate([
         page.locator("#exportLayout"),
         page.get_by_role("combobox").filter(has_text=re.compile("Export Layout|Layout", re.I)).first,
         page.get_by_role("button", name=re.compile(r"Export Layout|Select layout|Layout", re.I)).first,
         page.get_by_label(re.compile(r"Export Layout|Layout", re.I)).first,
-    ]:
+    ]):
         try:
-            await loc.wait_for(timeout=5000); dropdown = loc; break
+            async with candidate("open_export_and_start_job/dropdown", i):
+                await within("export.layout_dropdown", 5000, lambda t: loc.wait_for(timeout=t))
+            dropdown = loc; break
         except: continue
     if not dropdown:
         raise RuntimeError("Export modal: layout dropdown not found.")
 
     await dropdown.scroll_into_view_if_needed(); await dropdown.click()
     picked = False
-    for finder in [
+    for i, finder in enumerate([
         lambda: page.get_by_role("option",   name=_rx_exact(layout_text)).first,
         lambda: page.get_by_role("menuitem", name=_rx_exact(layout_text)).first,
         lambda: page.get_by_text(            _rx_exact(layout_text)).first,
-    ]:
+    ]):
         try:
-            await finder().click(timeout=5000); picked = True; break
+            async with candidate("open_export_and_start_job/layout", i):
+                await within("export.layout_option", 5000, lambda t: finder().click(timeout=t))
+            picked = True; break
         except: continue
     if not picked:
         raise RuntimeError(f"Export modal: layout '{layout_text}' not found.")
@@ -478,13 +2163,14 @@ async def open_export_and_start_job(layout_text: str, page):
         page.locator("button.k-button--primary, button.mat-primary").filter(has_text=re.compile(r"^\s*Export\b", re.I)).first,
         page.get_by_text(re.compile(r"^\s*Export\b.*", re.I)).first,
     ]
-    for btn in export_btn_candidates:
+    for i, btn in enumerate(export_btn_candidates):
         try:
-            await btn.scroll_into_view_if_needed()
-            await page.wait_for_timeout(200)
-            await btn.click(timeout=5000)
-            await page.wait_for_load_state("networkidle")
-            await asyncio.sleep(0.5)
+            async with candidate("open_export_and_start_job/submit", i):
+                await btn.scroll_into_view_if_needed()
+                await pause(0.2)
+                await within("export.submit", 5000, lambda t: btn.click(timeout=t))
+            await settle(page)
+            await pause(0.5)
             return
         except: continue
     raise RuntimeError("Export modal: could not find/click the Export button.")
@@ -506,9 +2192,9 @@ async def maybe_go_to_exports_prompt(page):
         lambda: page.get_by_text(re.compile(r"^\s*Go to Export(s)? Page\s*$", re.I)).first,
     ]:
         try:
-            await finder().click(timeout=2000)
-            await page.wait_for_load_state("networkidle")
-            await asyncio.sleep(0.3)
+            await within("export.prompt", 2000, lambda t: finder().click(timeout=t))
+            await settle(page)
+            await pause(0.3)
             return True
         except:
             continue
@@ -522,47 +2208,103 @@ async def disable_auto_refresh_if_present(page):
     try:
         # The text is next to a small refresh icon + a button; click the button if it's 'on'.
         block = page.locator("text=This page will auto-refresh").first
-        await block.wait_for(timeout=2000)
+        await within("exports.auto_refresh", 2000, lambda t: block.wait_for(timeout=t))
         # The toggle is usually the next sibling button/menu
         container = block.locator("xpath=..")  # parent row
         toggle = container.locator("button, [role='button']").filter(has=page.locator("svg")).first
         # If there is an aria-pressed attribute and it's 'true', click to disable.
         pressed = await toggle.get_attribute("aria-pressed")
         if pressed is None or pressed.lower() == "true":
-            await toggle.click(timeout=1500)
-            await page.wait_for_load_state("networkidle")
-            await asyncio.sleep(0.25)
+            await within("exports.auto_refresh_toggle", 1500, lambda t: toggle.click(timeout=t))
+            await settle(page)
+            await pause(0.25)
     except:
         # Not fatal if we can't find it; continue.
         pass
 
 
-async def fetch_latest_export_from_admin(page, layout_text: str, timeout_s: int = 180, skip_if_same=True):
+EXPORT_REUSE_MIN = float(os.getenv("EXPORT_REUSE_MIN", "0"))  # default for "reuseWithinMinutes"
+# Export files this tool waited for, with the filter set they ran with, so reuse only
+# picks up a file whose rows match the export's filters.
+EXPORT_FILES_PATH = Path(__file__).with_name(".export_files.json")
+EXPORT_FILES_KEEP = 200
+
+def filters_signature(exp: Dict) -> str:
+    return json.dumps({"gradYear": _parse_grad_year(exp), "statuses": _parse_statuses(exp)}, sort_keys=True)
+
+def remember_export_file(filename: str, filters: str):
+    files = _read_json(EXPORT_FILES_PATH)
+    files.pop(filename, None)
+    files[filename] = {"filters": filters, "at": datetime.now().isoformat(timespec="seconds")}
+    _write_json(EXPORT_FILES_PATH, dict(list(files.items())[-EXPORT_FILES_KEEP:]))
+
+_SUBMIT_DATE_FORMATS = ["%m/%d/%Y %I:%M %p", "%m/%d/%Y %I:%M:%S %p", "%m/%d/%Y %H:%M", "%m/%d/%Y %H:%M:%S",
+                        "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%m/%d/%y %I:%M %p"]
+
+def arms_now() -> datetime:
+    """
+    Now as a naive datetime on ARMS's clock, comparable with _parse_submit_date.
+    ARMS_TIMEZONE (IANA name, e.g. America/New_York) sets that clock; default: this machine's.
+    """
+    tz = os.getenv("ARMS_TIMEZONE")
+    if tz:
+        from zoneinfo import ZoneInfo
+        return datetime.now(ZoneInfo(tz)).replace(tzinfo=None)
+    return datetime.now()
+
+def _parse_submit_date(text: str) -> Optional[datetime]:
+    """ARMS 'Submit Date' cell → naive local datetime (None if it doesn't parse)."""
+    text = re.sub(r"\s+", " ", text or "").strip()
+    for fmt in _SUBMIT_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    try:
+        return datetime.fromisoformat(text).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+async def download_latest_export(page, layout_text: str, dest_dir: Path,
+                                 timeout_s: Optional[float] = None, skip_if_same=True,
+                                 max_age_min: Optional[float] = None,
+                                 filters: Optional[str] = None,
+                                 not_before: Optional[datetime] = None) -> Optional[Path]:
     """
     On Administration → Exports:
       • Disable auto-refresh
       • Sort by 'Submit Date' newest→oldest (best-effort)
       • Find first row where 'File / Data' filename matches layout tokens AND Status == Complete
-      • Click that link and download the CSV → DataFrame
+      • Click that link and save the CSV into dest_dir (None if skip_if_same says it's old)
+    With max_age_min, don't wait for a job: look once and download the newest match only
+    if its Submit Date is at most that many minutes ago (None otherwise).
+    `filters` (see filters_signature) is recorded for the file a job produced; with
+    max_age_min, a file recorded with a different (or no) filter set isn't reused.
+    `not_before` (ARMS clock, see arms_now) ignores rows submitted earlier, so waiting
+    for a job never picks up the previous run's file while the job is still pending.
     """
+    t_start = asyncio.get_event_loop().time()
     tokens = _layout_tokens(layout_text)
+    job_step = f"export.job:{layout_text}"
+    if timeout_s is None:
+        timeout_s = tmo(job_step, 180_000, floor_ms=60_000) / 1000
 
     # Navigate to Exports if we didn't arrive via the prompt.
     url = page.url.lower()
     if "admin" not in url or "export" not in url:
-        for step in [
-            lambda: page.get_by_text(_rx_exact("Administration")).first.click(timeout=3000),
-            lambda: page.get_by_role("link", name=re.compile(r"Administration", re.I)).first.click(timeout=3000),
+        for loc in [
+            page.get_by_text(_rx_exact("Administration")).first,
+            page.get_by_role("link", name=re.compile(r"Administration", re.I)).first,
         ]:
             try:
-                await step(); await page.wait_for_load_state("networkidle"); break
+                await within("nav.admin", 3000, lambda t: loc.click(timeout=t)); await settle(page); break
             except: pass
-        for step in [
-            lambda: page.get_by_text(_rx_exact("Exports")).first.click(timeout=3000),
-            lambda: page.get_by_role("link", name=re.compile(r"Exports", re.I)).first.click(timeout=3000),
+        for loc in [
+            page.get_by_text(_rx_exact("Exports")).first,
+            page.get_by_role("link", name=re.compile(r"Exports", re.I)).first,
         ]:
             try:
-                await step(); await page.wait_for_load_state("networkidle"); break
+                await within("nav.exports", 3000, lambda t: loc.click(timeout=t)); await settle(page); break
             except: pass
 
     # Turn off the page auto-refresh if it's on
@@ -573,23 +2315,24 @@ async def fetch_latest_export_from_admin(page, layout_text: str, timeout_s: int
         submit_hdr = page.locator("table thead th").filter(
             has=page.get_by_text(re.compile(r"^\s*Submit\s*Date\s*$", re.I))
         ).first
-        await submit_hdr.click(timeout=1500)
-        await page.wait_for_load_state("networkidle")
+        await within("exports.sort", 1500, lambda t: submit_hdr.click(timeout=t))
+        await settle(page)
         # click again to enforce desc if the first click sorted asc
-        await submit_hdr.click(timeout=1500)
-        await page.wait_for_load_state("networkidle")
+        await within("exports.sort", 1500, lambda t: submit_hdr.click(timeout=t))
+        await settle(page)
     except:
         pass  # best-effort
 
     # Resolve the index of the "File / Data" column so we always click the right link
-    file_col_idx = None
+    file_col_idx = submit_col_idx = None
     try:
         ths = page.locator("table thead th"); n_th = await ths.count()
         for i in range(n_th):
             t = (await ths.nth(i).inner_text()).strip().lower()
-            if "file" in t and "data" in t:
+            if "file" in t and "data" in t and file_col_idx is None:
                 file_col_idx = i
-                break
+            elif "submit" in t and "date" in t and submit_col_idx is None:
+                submit_col_idx = i
     except:
         pass
 
@@ -601,7 +2344,8 @@ async def fetch_latest_export_from_admin(page, layout_text: str, timeout_s: int
             row = body_rows.nth(i)
             try:
                 # Status must contain 'Complete'
-                await row.get_by_text(re.compile(r"\bComplete(d)?\b", re.I)).first.wait_for(timeout=250)
+                await within("exports.row_status", 250, floor_ms=60, fn=lambda t:
+                             row.get_by_text(re.compile(r"\bComplete(d)?\b", re.I)).first.wait_for(timeout=t))
             except:
                 continue
 
@@ -620,79 +2364,150 @@ async def fetch_latest_export_from_admin(page, layout_text: str, timeout_s: int
             if not fn or not _filename_matches_layout(fn, tokens):
                 continue
 
+            if not_before is not None and submit_col_idx is not None:
+                try:
+                    submitted = _parse_submit_date(await row.locator("td").nth(submit_col_idx).inner_text())
+                except:
+                    submitted = None
+                if submitted is None or submitted < not_before:
+                    continue
+
             return row, link, fn
         return None
 
-    # Poll up to timeout_s, but DO NOT reload the page (auto-refresh was disabled)
-    end = asyncio.get_event_loop().time() + timeout_s
-    found = None
+    if not_before is not None and submit_col_idx is None:
+        print(f"[warn] '{layout_text}': no Submit Date column — can't tell this job's file from older ones")
+
+    if max_age_min is not None:
+        found = await _find_newest_complete()
+        if not found or submit_col_idx is None:
+            return None
+        try:
+            submitted = _parse_submit_date(await found[0].locator("td").nth(submit_col_idx).inner_text())
+        except:
+            submitted = None
+        if submitted is None:
+            print(f"[info] '{layout_text}': can't read the Submit Date of {found[2]} — not reusing it")
+            return None
+        age_min = (arms_now() - submitted).total_seconds() / 60
+        if age_min < 0:
+            print(f"[warn] '{layout_text}': {found[2]} was submitted {-age_min:.0f} min in the future — "
+                  f"set ARMS_TIMEZONE to ARMS's time zone; not reusing it")
+            return None
+        if age_min > max_age_min:
+            return None
+        if filters is not None and (_read_json(EXPORT_FILES_PATH).get(found[2]) or {}).get("filters") != filters:
+            print(f"[info] '{layout_text}': {found[2]} wasn't produced with these filters — not reusing it")
+            return None
+        print(f"[info] '{layout_text}': reusing {found[2]}, completed export submitted {age_min:.0f} min ago")
+        return await _save_download(page, found[1], found[2], dest_dir)
+
+    # Poll up to timeout_s, but DO NOT reload the page (auto-refresh was disabled).
+    # Sleeps follow the layout's learned ETA; they are asyncio sleeps, so other pool
+    # workers and the upload threads use the wait.
+    start = asyncio.get_event_loop().time()
+    end = start + timeout_s
+    found, scans, polls = None, 0, PollSchedule(job_step)
     while asyncio.get_event_loop().time() < end:
         found = await _find_newest_complete()
+        scans += 1
+        now = asyncio.get_event_loop().time()
         if found:
+            STATS.record(job_step, now - start)
+            print(f"[info] '{layout_text}' complete after {now - start:.0f}s ({scans} scans"
+                  + (f", ETA was {polls.eta:.0f}s)" if polls.eta else ")"))
             break
-        await asyncio.sleep(1.0)
+        await asyncio.sleep(max(0.0, min(polls.next(now - start), end - now)))
+    METRICS.add("export_scans", scans)
 
     if not found:
         raise RuntimeError(f"Exports: no COMPLETE file found for layout '{layout_text}' within timeout.")
 
     row, link_el, filename = found
+    if filters is not None:
+        remember_export_file(filename, filters)
 
     # Optional skip-if-same logic
     cache = _read_cache() if skip_if_same else {}
     if skip_if_same and cache.get(layout_text) == filename:
         print(f"[info] latest file for '{layout_text}' already processed: {filename}")
-        return pd.DataFrame()
+        return None
     if skip_if_same:
         cache[layout_text] = filename
         _write_cache(cache)
 
+    save_to = await _save_download(page, link_el, filename, dest_dir)
+    METRICS.record(f"download:{layout_text}", asyncio.get_event_loop().time() - t_start)
+    return save_to
+
+async def _save_download(page, link_el, filename: str, dest_dir: Path) -> Path:
     # Click the link and download (now that the page is stable)
     async with page.expect_download() as dl_ctx:
         await link_el.click()
     download = await dl_ctx.value
 
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    save_to = dest_dir / re.sub(r"[^\w.\- ]+", "_", download.suggested_filename or filename or "export.csv")
+    await download.save_as(str(save_to))
+    METRICS.add("bytes_downloaded", save_to.stat().st_size)
+    return save_to
+
+def read_export_csv(path: Path, layout_text: str) -> pd.DataFrame:
+    import pandas as pd
+    try:
+        df = pd.read_csv(path, dtype=str, encoding="utf-8-sig")
+    except Exception:
+        df = pd.read_csv(path, dtype=str)
+    remember_layout_columns(layout_text, list(df.columns))
+    return df
+
+async def fetch_latest_export_from_admin(page, layout_text: str, timeout_s: Optional[float] = None, skip_if_same=True):
+    """download_latest_export into a temp dir → DataFrame (empty if skipped as already processed)."""
     with tempfile.TemporaryDirectory() as td:
-        path = await download.path()
+        path = await download_latest_export(page, layout_text, Path(td), timeout_s, skip_if_same)
         if path is None:
-            save_to = os.path.join(td, download.suggested_filename or filename or "export.csv")
-            await download.save_as(save_to); path = save_to
-        try:
-            return pd.read_csv(path, dtype=str, encoding="utf-8-sig")
-        except Exception:
-            return pd.read_csv(path, dtype=str)
+            import pandas as pd
+            return pd.DataFrame()
+        return await asyncio.to_thread(read_export_csv, path, layout_text)
+
 async def start_export_from_admin(layout_text: str, page):
     import re, asyncio
 
     # Administration → Exports
-    for step in [
-        lambda: page.get_by_role("link", name=re.compile(r"Administration", re.I)).first.click(timeout=3000),
-        lambda: page.get_by_text(re.compile(r"^\s*Administration\s*$", re.I)).first.click(timeout=3000),
-    ]:
+    for i, loc in enumerate([
+        page.get_by_role("link", name=re.compile(r"Administration", re.I)).first,
+        page.get_by_text(re.compile(r"^\s*Administration\s*$", re.I)).first,
+    ]):
         try:
-            await step(); await page.wait_for_load_state("networkidle"); break
+            async with candidate("start_export_from_admin/admin", i):
+                await within("nav.admin", 3000, lambda t: loc.click(timeout=t))
+            await settle(page); break
         except: pass
-    for step in [
-        lambda: page.get_by_role("link", name=re.compile(r"Exports", re.I)).first.click(timeout=3000),
-        lambda: page.get_by_text(re.compile(r"^\s*Exports\s*$", re.I)).first.click(timeout=3000),
-    ]:
+    for i, loc in enumerate([
+        page.get_by_role("link", name=re.compile(r"Exports", re.I)).first,
+        page.get_by_text(re.compile(r"^\s*Exports\s*$", re.I)).first,
+    ]):
         try:
-            await step(); await page.wait_for_load_state("networkidle"); break
+            async with candidate("start_export_from_admin/exports", i):
+                await within("nav.exports", 3000, lambda t: loc.click(timeout=t))
+            await settle(page); break
         except: pass
 
     # Try to open the Export menu (3-line "hamburger" or More button)
-    for sel in [
+    for i, sel in enumerate([
         "button[aria-label*='Menu']",
         "button[title*='Menu']",
         "button:has(svg)",   # generic icon buttons
         "button:has-text('≡')",
         "button:has(.kebab), button:has(.hamburger)",
-    ]:
+    ]):
         try:
             btn = page.locator(sel).first
-            await btn.wait_for(timeout=5000)
+            async with candidate("start_export_from_admin/menu", i):
+                await within("admin.menu_trigger", 5000, lambda t: btn.wait_for(timeout=t))
             await btn.scroll_into_view_if_needed()
             await btn.click()
-            await page.wait_for_timeout(1000)  # wait for dropdown to open
+            await pause(1.0)  # wait for dropdown to open
             break
         except Exception:
             continue
@@ -700,16 +2515,17 @@ async def start_export_from_admin(layout_text: str, page):
         raise RuntimeError("Hamburger/3-line menu not found")
     
     # Step 2: click the "Export" option from the dropdown
-    for sel in [
+    for i, sel in enumerate([
         "text=Export",
         "button:has-text('Export')",
         "div[role='menu'] >> text=Export",
-    ]:
+    ]):
         try:
             export_btn = page.locator(sel).first
-            await export_btn.wait_for(timeout=5000)
+            async with candidate("start_export_from_admin/export_item", i):
+                await within("admin.menu_export", 5000, lambda t: export_btn.wait_for(timeout=t))
             await export_btn.click()
-            await page.wait_for_load_state("networkidle")
+            await settle(page)
             break
         except Exception:
             continue
@@ -718,39 +2534,45 @@ async def start_export_from_admin(layout_text: str, page):
     
     # Choose layout
     dropdown = None
-    for loc in [
+    for i, loc in enumerate([
         page.locator("#exportLayout"),
         page.get_by_role("combobox").filter(has_text=re.compile("Export Layout|Layout", re.I)).first,
         page.get_by_role("button", name=re.compile(r"Export Layout|Select layout|Layout", re.I)).first,
         page.get_by_label(re.compile(r"Export Layout|Layout", re.I)).first,
-    ]:
+    ]):
         try:
-            await loc.wait_for(timeout=4000); await loc.click(); dropdown = loc; break
+            async with candidate("start_export_from_admin/dropdown", i):
+                await within("export.layout_dropdown", 4000, lambda t: loc.wait_for(timeout=t))
+            await loc.click(); dropdown = loc; break
         except: continue
     if not dropdown:
         raise RuntimeError("Admin Export: layout selector not found.")
 
     picked = False
-    for finder in [
+    for i, finder in enumerate([
         lambda: page.get_by_role("option",   name=_rx_exact(layout_text)).first,
         lambda: page.get_by_role("menuitem", name=_rx_exact(layout_text)).first,
         lambda: page.get_by_text(            _rx_exact(layout_text)).first,
-    ]:
+    ]):
         try:
-            el = finder(); await el.scroll_into_view_if_needed(); await el.click(timeout=4000); picked = True;break
+            async with candidate("start_export_from_admin/layout", i):
+                el = finder(); await el.scroll_into_view_if_needed(); await within("export.layout_option", 4000, lambda t: el.click(timeout=t))
+            picked = True; break
         except: continue
     if not picked:
         raise RuntimeError(f"Admin Export: layout '{layout_text}' not found.")
 
     # Click Export/Submit
-    for btn in [
+    for i, btn in enumerate([
         page.get_by_role("button", name=re.compile(r"^\s*Export\b", re.I)).first,
         page.locator("button[type='submit']").first,
         page.locator("button.k-button--primary, button.mat-primary").filter(has_text=re.compile(r"^\s*Export\b", re.I)).first,
-    ]:
+    ]):
         try:
-            await btn.scroll_into_view_if_needed(); await page.wait_for_timeout(200)
-            await btn.click(timeout=4000); await page.wait_for_load_state("networkidle"); return
+            async with candidate("start_export_from_admin/submit", i):
+                await btn.scroll_into_view_if_needed(); await pause(0.2)
+                await within("export.submit", 4000, lambda t: btn.click(timeout=t))
+            await settle(page); return
         except: continue
     raise RuntimeError("Admin Export: could not click the final Export button.")
 
@@ -763,166 +2585,1152 @@ def _parse_grad_year(exp: Dict):
         return m.group(1) if m else None
     return None
 
-async def do_one_export(page, exp: Dict):
+def export_key(exp: Dict) -> str:
+    """Stable per-tenant identity of an export, used for probe and checkpoint state."""
     name = exp.get("name", "Unnamed")
-    tab  = exp.get("tab")
     layout_text = exp.get("export", {}).get("layoutOptionText") or name.replace("_", " ")
-    print(f"\n=== Export: {name} → Tab: {tab} ===", flush=True)
+    return f"{os.getenv('ARMS_TENANT', '')}{name}|{layout_text}"
+
+async def do_one_export(page, exp: Dict, uploads: Optional["UploadPipeline"] = None):
+    """
+    Browser half of one export: filters → export job → download. The transform/upload
+    half is handed to `uploads` (if given) so the browser can move on immediately.
+    Stage boundaries are checkpointed; an interrupted run resumes from the last one.
+    A failure or cancellation dumps the export's flight record (see FlightRecorder).
+    """
+    rec = FlightRecorder(page, exp.get("name", "Unnamed"))
+    token = _FLIGHT.set(rec)
+    rec.attach()
+    try:
+        with METRICS.phase(f"extract:{exp.get('name', 'Unnamed')}"):
+            await _do_one_export(page, exp, uploads)
+    except Exception as e:
+        await rec.dump(e, "export")
+        raise
+    except asyncio.CancelledError as e:
+        # asyncio.wait_for timeouts and budget cutoffs cancel rather than raise
+        await rec.dump(e, "cancelled")
+        raise
+    finally:
+        rec.detach()
+        _FLIGHT.reset(token)
+
+async def _do_one_export(page, exp: Dict, uploads: Optional["UploadPipeline"] = None):
+    name = exp.get("name", "Unnamed")
+    tabs = ", ".join(o["tab"] for o in export_outputs(exp))
+    layout_text = exp.get("export", {}).get("layoutOptionText") or name.replace("_", " ")
+    print(f"\n=== Export: {name} → Tab: {tabs} ===", flush=True)
+
+    key = export_key(exp)
+    ck = CHECKPOINT.resume_point(key)
+    stage, sig, df = ck.get("stage"), ck.get("sig") or {}, None
+    if stage == "written":
+        print(f"[info] {name}: already written by the interrupted run — skipped.")
+        CHECKPOINT.mark(key, "written")
+        return
+    if stage in ("downloaded", "transformed") and ck.get("path") and Path(ck["path"]).exists():
+        print(f"[info] {name}: resuming from downloaded file {ck['path']}")
+        df = await asyncio.to_thread(open_export, Path(ck["path"]), layout_text, exp)
+    elif stage == "submitted":
+        print(f"[info] {name}: resuming — polling job submitted at {ck.get('submittedAt')}")
+        try:
+            not_before = datetime.fromisoformat(ck["submittedAt"])
+        except Exception:
+            not_before = None
+        path = await download_latest_export(page, layout_text, DOWNLOAD_DIR, skip_if_same=False,
+                                            filters=filters_signature(exp), not_before=not_before)
+        CHECKPOINT.mark(key, "downloaded", path=str(path))
+        df = await asyncio.to_thread(open_export, path, layout_text, exp)
+    else:
+        path = await _reuse_recent_export(page, exp, layout_text)
+        if path is not None:
+            CHECKPOINT.mark(key, "downloaded", path=str(path))
+            df = await asyncio.to_thread(open_export, path, layout_text, exp)
+        else:
+            df, sig = await _extract_fresh(page, exp, key, layout_text)
+            if df is None:
+                return
+
+    if df.empty:
+        print(f"[info] No new rows for '{layout_text}' (skipped).")
+        return
+
+    def on_written():
+        remember_probe(key, sig)
+        CHECKPOINT.mark(key, "written")
+    if uploads is not None:
+        await uploads.submit(df, exp, on_written)
+    elif await asyncio.to_thread(publish_frame, df, exp):
+        on_written()
+
+async def _reuse_recent_export(page, exp: Dict, layout_text: str) -> Optional[Path]:
+    """
+    "reuseWithinMinutes": N — if a Complete export of this layout was submitted in the
+    last N minutes by an earlier run with the same filters (an overlapping schedule, a
+    retry), download that one and skip Recruits/filters/submit. Files of unknown origin,
+    such as manual exports, are never reused since their filters can't be checked.
+    """
+    window = float(exp.get("reuseWithinMinutes") or EXPORT_REUSE_MIN)
+    if window <= 0:
+        return None
+    try:
+        return await download_latest_export(page, layout_text, DOWNLOAD_DIR, skip_if_same=False,
+                                            max_age_min=window, filters=filters_signature(exp))
+    except Exception as e:
+        print(f"[warn] looking for a reusable export failed: {e}")
+        await flight_dump(e, "reuse")
+        return None
+
+async def _extract_fresh(page, exp: Dict, key: str, layout_text: str):
+    """Recruits → filters → (probe skip | grid API | export job) → (df, probe signature); df None if skipped."""
+    name = exp.get("name", "Unnamed")
 
     # Close any open modal from prior run
     try:
-        await page.get_by_role("button", name=_rx_exact("Cancel")).first.click(timeout=800)
-        await page.wait_for_load_state("networkidle")
+        await within("modal.cancel", 800, lambda t: page.get_by_role("button", name=_rx_exact("Cancel")).first.click(timeout=t))
+        await settle(page)
     except:
         pass
 
-    await click_recruiting_recruits(page)
-
-    scope = await find_filters_scope(page)
+    probe, grid = RecruitsProbe(page), GridRecorder(page)
+    probe.attach(); grid.attach()
     try:
-        await apply_filters(scope, _parse_grad_year(exp), _parse_statuses(exp))
-    except Exception as e:
-        print(f"[warn] filter step issue: {e}")
+        await click_recruiting_recruits(page)
 
+        scope = await find_filters_scope(page)
+        try:
+            await apply_filters(scope, _parse_grad_year(exp), _parse_statuses(exp))
+        except Exception as e:
+            print(f"[warn] filter step issue: {e}")
+            await flight_dump(e, "filters")
+        sig = await probe.signature()
+        await flight_snapshot("filters applied")
+    finally:
+        probe.detach(); grid.detach()
+    CHECKPOINT.mark(key, "filtered", sig=sig)
+
+    if exp.get("skipIfUnchanged") and probe_unchanged(key, sig, exp):
+        print(f"[info] {name}: ARMS data unchanged since last run {sig} — export skipped.")
+        CHECKPOINT.mark(key, "written", sig=sig)
+        return None, sig
+
+    if (exp.get("engine") or EXTRACT_ENGINE) == "api":
+        df = None
+        try:
+            df = await extract_via_grid_api(page, grid, layout_text, exp)
+        except Exception as e:
+            print(f"[warn] grid API extraction failed: {e}")
+            await flight_dump(e, "grid_api")
+        if df is not None:
+            path = DOWNLOAD_DIR / (re.sub(r"[^\w.-]+", "_", name) + ".api.csv")
+            DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(df.to_csv, path, index=False)
+            CHECKPOINT.mark(key, "downloaded", path=str(path))
+            return df, sig
+        print(f"[info] {name}: falling back to the ARMS export job")
+
+    # Submit Dates have minute precision and ARMS's clock may lag ours a little
+    not_before = arms_now().replace(second=0, microsecond=0) - timedelta(minutes=1)
     try:
         await open_right_kebab_and_click_export(page)
         await open_export_and_start_job(layout_text, page)
         await maybe_go_to_exports_prompt(page)
     except Exception as e:
         print(f"[warn] hamburger path failed: {e} — falling back to Admin → Exports")
+        await flight_dump(e, "hamburger")
         await start_export_from_admin(layout_text, page)
+    await flight_snapshot("export submitted")
+    CHECKPOINT.mark(key, "submitted", submittedAt=not_before.isoformat(timespec="seconds"))
 
     # Download latest export and write to Sheets
-    df = await fetch_latest_export_from_admin(page, layout_text, skip_if_same=False)
-    if df is None or df.empty:
-        print(f"[info] No new rows for '{layout_text}' (skipped).")
-        return
-
-    df = clean_mobile_numbers(df)
-    df = add_full_name_columns(df)
-    df = add_social_urls(df)
+    path = await download_latest_export(page, layout_text, DOWNLOAD_DIR, skip_if_same=False,
+                                        filters=filters_signature(exp), not_before=not_before)
+    CHECKPOINT.mark(key, "downloaded", path=str(path))
+    return await asyncio.to_thread(open_export, path, layout_text, exp), sig
 
-    try:
-        overwrite_tab(df, tab)
-        print(f"[info] wrote {len(df):,} rows to '{tab}'")
-    except Exception as e:
-        print(f"[error] failed to write to Sheets for {name}: {e}")
-
-
-async def run():
+# ===================== BROWSER / LOGIN =====================
+def load_config() -> Dict:
     cfg_path = Path(__file__).with_name("config.json")
     with cfg_path.open() as f:
-        config = json.load(f)
-
-    async with async_playwright() as pw:
-        browser = await pw.chromium.launch(
-            headless=HEADLESS,
-            args=[
-                "--no-sandbox",
-                "--disable-setuid-sandbox",
-                "--disable-dev-shm-usage",
-                "--disable-blink-features=AutomationControlled",
-            ],
-        )
-        context = await browser.new_context(accept_downloads=True, viewport={"width": 1366, "height": 900})
-        page = await context.new_page()
-
-        # Login
-        print("[info] Logging into ARMS ...")
-        await page.goto(ARMS_LOGIN_URL, wait_until="load")
-        print("[debug] at URL:", page.url)
-        
-        # --- fill username/email
-        try:
+        return json.load(f)
+
+BROWSER_ARGS = [
+    "--no-sandbox",
+    "--disable-setuid-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-blink-features=AutomationControlled",
+]
+
+CONTEXT_OPTS = {"accept_downloads": True, "viewport": {"width": 1366, "height": 900}}
+
+async def launch_browser(pw):
+    """Launch Chromium and open one download-enabled page. Returns (browser, context, page)."""
+    browser = await get_browser(pw)
+    context = await browser.new_context(**CONTEXT_OPTS)
+    page = await context.new_page()
+    return browser, context, page
+
+async def login(page):
+    print("[info] Logging into ARMS ...")
+    await page.goto(ARMS_LOGIN_URL, wait_until="load")
+    print("[debug] at URL:", page.url)
+
+    # --- fill username/email
+    try:
+        async with candidate("login/username", "label"):
             await page.get_by_label(re.compile(r"Email|Username", re.I)).first.fill(ARMS_USER)
-        except:
+    except:
+        async with candidate("login/username", "input"):
             await page.locator('input[type="email"], input[name*="user" i], input[type="text"]').first.fill(ARMS_USER)
-        
-        # click Next if present
-        try:
-            btn_next = page.get_by_role("button", name=_rx_exact("Next")).first
-            if await btn_next.count():
-                await btn_next.click()
-                await page.wait_for_load_state("networkidle")
-                await page.wait_for_timeout(800)
-        except:
-            pass
-        
-        # --- find password field (page or any iframe), then fill
-        async def _find_password_locator():
-            # main page first
+    
+    # click Next if present
+    try:
+        btn_next = page.get_by_role("button", name=_rx_exact("Next")).first
+        if await btn_next.count():
+            await btn_next.click()
+            await settle(page)
+            await pause(0.8)
+    except:
+        pass
+    
+    # --- find password field (page or any iframe), then fill
+    async def _find_password_locator():
+        # main page first
+        candidates = [
+            page.get_by_label(re.compile(r"Password", re.I)).first,
+            page.locator('input[type="password"]').first,
+            page.locator('input[name*="pass" i]').first,
+        ]
+        for i, loc in enumerate(candidates):
+            try:
+                async with candidate("login/password", i):
+                    await within("login.password", 6000, lambda t: loc.wait_for(timeout=t))
+                return loc
+            except:
+                pass
+        # try frames
+        for fr in page.frames:
             candidates = [
-                page.get_by_label(re.compile(r"Password", re.I)).first,
-                page.locator('input[type="password"]').first,
-                page.locator('input[name*="pass" i]').first,
+                fr.get_by_label(re.compile(r"Password", re.I)).first,
+                fr.locator('input[type="password"]').first,
+                fr.locator('input[name*="pass" i]').first,
             ]
-            for loc in candidates:
+            for i, loc in enumerate(candidates):
                 try:
-                    await loc.wait_for(timeout=6000)
+                    async with candidate("login/password_frame", i):
+                        await within("login.password_frame", 4000, lambda t: loc.wait_for(timeout=t))
                     return loc
                 except:
                     pass
-            # try frames
-            for fr in page.frames:
-                candidates = [
-                    fr.get_by_label(re.compile(r"Password", re.I)).first,
-                    fr.locator('input[type="password"]').first,
-                    fr.locator('input[name*="pass" i]').first,
-                ]
-                for loc in candidates:
-                    try:
-                        await loc.wait_for(timeout=4000)
-                        return loc
-                    except:
-                        pass
-            return None
-        
-        pwd = await _find_password_locator()
-        if not pwd:
-            # tiny nudge: sometimes a second 'Next' or focus is needed
+        return None
+    
+    pwd = await _find_password_locator()
+    if not pwd:
+        # tiny nudge: sometimes a second 'Next' or focus is needed
+        try:
+            await page.keyboard.press("Tab")
+            await pause(0.4)
+            pwd = await _find_password_locator()
+        except:
+            pass
+    
+    if not pwd:
+        raise RuntimeError("Could not find password field after waiting")
+    
+    await pwd.fill(ARMS_PASS)
+    
+    # submit
+    submitted = False
+    for i, b in enumerate([
+        page.get_by_role("button", name=re.compile(r"Sign in|Log in|Login", re.I)).first,
+        page.locator('button[type="submit"]').first,
+    ]):
+        try:
+            async with candidate("login/submit", i):
+                await within("login.submit", 4000, lambda t: b.click(timeout=t))
+            submitted = True
+            break
+        except:
+            continue
+    if not submitted:
+        try:
+            await pwd.press("Enter")
+        except:
+            pass
+    
+    await settle(page)
+    print("[info] Login complete.")
+
+def select_exports(config: Dict, only: Optional[List[str]] = None) -> List[Dict]:
+    """All exports, or just those whose name/tab/layout matches one of `only` (case-insensitive)."""
+    exports = config.get("exports", [])
+    if not only:
+        return exports
+    want = {o.strip().lower() for o in only}
+    picked = []
+    for exp in exports:
+        keys = {str(exp.get("name", "")).lower(), str(exp.get("tab", "")).lower(),
+                str(exp.get("export", {}).get("layoutOptionText", "")).lower()}
+        if keys & want:
+            picked.append(exp)
+    return picked
+
+async def run(only: Optional[List[str]] = None, config: Optional[Dict] = None,
+              budget_min: Optional[float] = None) -> Dict:
+    """
+    Run the exports once on the browser pool, within `budget_min` minutes (RUN_BUDGET_MIN)
+    if set. Returns {"written": [...], "failed": [...], "deferred": [...]}.
+    """
+    load_env()
+    from playwright.async_api import async_playwright
+    config = config if config is not None else load_config()
+    exports = select_exports(config, only)
+    if only and not exports:
+        raise SystemExit(f"[fatal] No export matches: {', '.join(only)}")
+    FALLBACKS.stats.clear()  # per run (the daemon reports and clears per cycle)
+    METRICS.reset()
+    STATS.new_run()
+    started, t0 = datetime.now(), time.perf_counter()
+    run_id = f"{started:%Y%m%dT%H%M%S}-{os.getpid()}"
+
+    exports = plan_exports(exports, min(len(exports), max(1, POOL_BROWSERS) * max(1, POOL_CONTEXTS)))
+    budget = RunBudget(RUN_BUDGET_MIN if budget_min is None else budget_min, export_costs(exports))
+    if budget.deadline is not None:
+        print(f"[info] run budget: {budget.remaining() / 60:.0f} min")
+
+    async with async_playwright() as pw:
+        pool = BrowserPool(pw, budget)
+        try:
+            with METRICS.phase("browser.start"):
+                await pool.start()
+            joins = JoinStage(config.get("joins") or [])
+            uploads = UploadPipeline(collect=joins.offer)
+            failed = await pool.run(exports, uploads)
+            failed += await uploads.close()
+        finally:
+            await pool.close()
+        failed += await asyncio.to_thread(joins.run)
+        if not failed:
+            CHECKPOINT.clear([export_key(e) for e in exports])
+        prune_downloads()
+
+        STATS.save()
+        FALLBACKS.report()
+        METRICS.record("run", time.perf_counter() - t0)
+        try:
+            save_run_history(run_id, started, time.perf_counter() - t0, len(uploads.written), len(failed))
+            check_regressions(run_id)
+        except Exception as e:
+            print(f"[warn] run history not recorded: {e}")
+        if budget.deferred:
+            print(f"[warn] {len(budget.deferred)} export(s) deferred by the run budget: {', '.join(budget.deferred)}")
+        print("\n[done] All exports processed.")
+    return {"written": uploads.written, "failed": failed, "deferred": budget.deferred}
+
+# ===================== EXECUTION PLAN =====================
+# Each export costs a browser slot for its extract phase (filters → job → download)
+# and then an upload worker for its publish phase. Both are estimated from the
+# run history (median of the last HISTORY_BASELINE_RUNS runs); exports without
+# history get the defaults. Higher "priority" always goes first. Within a priority,
+# EXPORT_ORDER=cost simulates a few candidate orders and keeps the shortest makespan:
+# file order, longest-first (LPT), and Johnson's rule for the two-stage
+# extract → publish flow (short extracts with long uploads first, so uploads start
+# early; long extracts with short uploads last). "config" keeps file order.
+EXPORT_ORDER          = os.getenv("EXPORT_ORDER", "cost").lower()
+COST_DEFAULT_EXTRACT_S = float(os.getenv("COST_DEFAULT_EXTRACT_S", "120"))
+COST_DEFAULT_PUBLISH_S = float(os.getenv("COST_DEFAULT_PUBLISH_S", "30"))
+
+def export_costs(exports: List[Dict]) -> Dict[str, Dict]:
+    """name → {"extract": s, "publish": s, "known": bool} from the run history."""
+    hist: Dict[str, List[float]] = {}
+    if HISTORY_DB.exists():
+        try:
+            con = _history_db()
             try:
-                await page.keyboard.press("Tab")
-                await page.wait_for_timeout(400)
-                pwd = await _find_password_locator()
-            except:
+                rows = con.execute("""SELECT m.name, m.value FROM metrics m JOIN runs r ON r.run_id = m.run_id
+                                      WHERE m.kind = 'phase' AND r.tenant = ? ORDER BY r.started DESC""",
+                                   (os.getenv("ARMS_TENANT", ""),)).fetchall()
+            finally:
+                con.close()
+            for name, value in rows:
+                xs = hist.setdefault(name, [])
+                if len(xs) < HISTORY_BASELINE_RUNS:
+                    xs.append(value)
+        except Exception as e:
+            print(f"[warn] run history unreadable, planning with defaults: {e}")
+    costs = {}
+    for exp in exports:
+        name = exp.get("name", "Unnamed")
+        ext, pub = hist.get(f"extract:{name}"), hist.get(f"publish:{name}")
+        costs[name] = {"extract": _pct(ext, 0.5) if ext else COST_DEFAULT_EXTRACT_S,
+                       "publish": _pct(pub, 0.5) if pub else COST_DEFAULT_PUBLISH_S,
+                       "known": bool(ext)}
+    return costs
+
+def simulate_plan(exports: List[Dict], costs: Dict[str, Dict], browsers: int, uploaders: int) -> tuple:
+    """
+    List-schedule `exports` in order onto `browsers` extract slots and `uploaders`
+    upload workers, the way BrowserPool/UploadPipeline pick them up.
+    Returns (rows, makespan); each row is (exp, slot, start, extracted, done).
+    """
+    slots = [(0.0, i) for i in range(max(1, browsers))]
+    ups = [0.0] * max(1, uploaders)
+    heapq.heapify(slots)
+    rows, makespan = [], 0.0
+    for exp in exports:
+        c = costs[exp.get("name", "Unnamed")]
+        start, slot = heapq.heappop(slots)
+        extracted = start + c["extract"]
+        heapq.heappush(slots, (extracted, slot))
+        u = min(range(len(ups)), key=ups.__getitem__)
+        done = max(extracted, ups[u]) + c["publish"]
+        ups[u] = done
+        rows.append((exp, slot, start, extracted, done))
+        makespan = max(makespan, done)
+    return rows, makespan
+
+RUN_BUDGET_MIN = float(os.getenv("RUN_BUDGET_MIN", "0"))  # 0 = no budget
+
+class RunBudget:
+    """
+    A run's wall-clock budget. Before a worker starts an export it asks admit(): the
+    export is deferred when its estimated extract + publish no longer fits in what is
+    left. Work already started is never interrupted, so set the budget some minutes
+    under the hard job timeout to leave room for the last uploads.
+    The deadline is RUN_DEADLINE (epoch seconds) when set: main() fixes it once per
+    invocation, so tenants queued behind TENANT_CONCURRENCY share the same end time
+    instead of each starting a fresh budget.
+    """
+    def __init__(self, minutes: float, costs: Dict[str, Dict]):
+        deadline = os.getenv("RUN_DEADLINE")
+        if deadline:
+            self.deadline: Optional[float] = float(deadline)
+        else:
+            self.deadline = time.time() + minutes * 60 if minutes > 0 else None
+        self.costs = costs
+        self.deferred: List[str] = []
+
+    def remaining(self) -> float:
+        return float("inf") if self.deadline is None else self.deadline - time.time()
+
+    def admit(self, exp: Dict) -> bool:
+        if self.deadline is None:
+            return True
+        name = exp.get("name", "Unnamed")
+        c = self.costs.get(name) or {"extract": COST_DEFAULT_EXTRACT_S, "publish": COST_DEFAULT_PUBLISH_S}
+        need, left = c["extract"] + c["publish"], self.remaining()
+        if need <= left:
+            return True
+        self.deferred.append(name)
+        print(f"[warn] budget: {name} (priority {_priority(exp)}) deferred — needs ~{need / 60:.1f} min, "
+              f"{max(0.0, left) / 60:.1f} min left")
+        return False
+
+def _johnson_key(c: Dict) -> tuple:
+    if c["extract"] < c["publish"]:
+        return (0, c["extract"])
+    return (1, -c["publish"])
+
+def plan_exports(exports: List[Dict], workers: int, show: bool = True) -> List[Dict]:
+    """Order exports for the pool (see EXPORT_ORDER) and print the estimated plan."""
+    if not exports:
+        return exports
+    costs = export_costs(exports)
+    cost = lambda e: costs[e.get("name", "Unnamed")]
+    candidates = {"config": lambda e: 0}
+    if EXPORT_ORDER == "cost":
+        candidates["longest-first"] = lambda e: -(cost(e)["extract"] + cost(e)["publish"])
+        candidates["johnson"] = lambda e: _johnson_key(cost(e))
+    plans = {}
+    for label, key in candidates.items():
+        order = sorted(exports, key=lambda e: (-_priority(e), key(e)))  # stable: ties keep file order
+        plans[label] = (order, *simulate_plan(order, costs, workers, UPLOAD_WORKERS))
+    label = min(plans, key=lambda k: plans[k][2])  # dicts keep insertion order: config wins ties
+    ordered, rows, makespan = plans[label]
+    if show:
+        alts = ", ".join(f"{k} {v[2] / 60:.1f}" for k, v in plans.items() if k != label)
+        print(f"[plan] {len(ordered)} export(s) on {workers} browser slot(s) / {UPLOAD_WORKERS} uploader(s), "
+              f"order={label}: est. {makespan / 60:.1f} min" + (f" (vs {alts} min)" if alts else ""))
+        for exp, slot, start, extracted, done in rows:
+            c = costs[exp.get("name", "Unnamed")]
+            print(f"  {exp.get('name', 'Unnamed'):<28} slot {slot}  {start / 60:5.1f}→{extracted / 60:5.1f} min extract, "
+                  f"written by {done / 60:5.1f} min" + ("" if c["known"] else "  (no history)"))
+    return ordered
+
+# ===================== BROWSER SERVER =====================
+# BROWSER_CDP_URL=http://host:9222 attaches to a Chromium someone else runs.
+# BROWSER_SERVER=1 keeps our own Chromium alive between invocations: the first run
+# launches it detached with a remote-debugging port, later runs (and tenants, and
+# the pool's extra browsers) just attach over CDP. A dead server is relaunched.
+BROWSER_CDP_URL = os.getenv("BROWSER_CDP_URL", "").strip()
+BROWSER_SERVER = os.getenv("BROWSER_SERVER", "false").lower() in ("1", "true", "yes")
+BROWSER_SERVER_PORT = int(os.getenv("BROWSER_SERVER_PORT", "9222"))
+BROWSER_SERVER_STATE = Path(__file__).with_name(".browser_server.json")
+BROWSER_SERVER_PROFILE = Path(tempfile.gettempdir()) / "arms-browser-server"
+
+def _cdp_alive(endpoint: str) -> bool:
+    try:
+        with urllib.request.urlopen(endpoint.rstrip("/") + "/json/version", timeout=2) as r:
+            return r.status == 200
+    except Exception:
+        return False
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+def ensure_browser_server(pw) -> str:
+    """Return the CDP endpoint of our long-lived Chromium, launching it if it isn't answering."""
+    st = _read_json(BROWSER_SERVER_STATE)
+    endpoint = st.get("endpoint") or f"http://127.0.0.1:{BROWSER_SERVER_PORT}"
+    if _cdp_alive(endpoint):
+        return endpoint
+    if st:
+        print(f"[warn] browser server at {endpoint} is not answering — relaunching")
+        if _pid_alive(st.get("pid")):
+            try: os.kill(st["pid"], signal.SIGTERM)
+            except OSError: pass
+
+    endpoint = f"http://127.0.0.1:{BROWSER_SERVER_PORT}"
+    cmd = [pw.chromium.executable_path, f"--remote-debugging-port={BROWSER_SERVER_PORT}",
+           f"--user-data-dir={BROWSER_SERVER_PROFILE}", "--no-first-run", "--no-default-browser-check",
+           *BROWSER_ARGS]
+    if HEADLESS:
+        cmd.append("--headless=new")
+    cmd.append("about:blank")
+    proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        if _cdp_alive(endpoint):
+            _write_json(BROWSER_SERVER_STATE, {"pid": proc.pid, "endpoint": endpoint,
+                                               "started": datetime.now().isoformat(timespec="seconds")})
+            print(f"[info] browser server started (pid {proc.pid}) at {endpoint}")
+            return endpoint
+        if proc.poll() is not None:
+            break
+        time.sleep(0.25)
+    raise RuntimeError(f"browser server did not come up on port {BROWSER_SERVER_PORT}")
+
+def stop_browser_server():
+    st = _read_json(BROWSER_SERVER_STATE)
+    if _pid_alive(st.get("pid")):
+        os.kill(st["pid"], signal.SIGTERM)
+        print(f"[info] browser server (pid {st['pid']}) stopped")
+    else:
+        print("[info] no browser server running")
+    BROWSER_SERVER_STATE.unlink(missing_ok=True)
+
+async def get_browser(pw):
+    """
+    A connected Browser: attached over CDP when BROWSER_CDP_URL / BROWSER_SERVER is set,
+    otherwise a fresh launch. Closing an attached browser only drops our contexts and
+    disconnects — the server keeps running for the next invocation.
+    """
+    if BROWSER_CDP_URL:
+        return await pw.chromium.connect_over_cdp(BROWSER_CDP_URL)
+    if BROWSER_SERVER:
+        endpoint = await asyncio.to_thread(ensure_browser_server, pw)
+        try:
+            return await pw.chromium.connect_over_cdp(endpoint)
+        except Exception as e:
+            print(f"[warn] attach to {endpoint} failed ({e}) — falling back to a local launch")
+    return await pw.chromium.launch(headless=HEADLESS, args=BROWSER_ARGS)
+
+# ===================== BROWSER POOL =====================
+POOL_BROWSERS       = int(os.getenv("POOL_BROWSERS", "1"))
+POOL_CONTEXTS       = int(os.getenv("POOL_CONTEXTS_PER_BROWSER", "1"))
+POOL_TASK_TIMEOUT_S = float(os.getenv("POOL_TASK_TIMEOUT_S", "900"))  # a page stuck longer is recycled
+POOL_MAX_ATTEMPTS   = int(os.getenv("POOL_MAX_ATTEMPTS", "2"))
+
+class BrowserPool:
+    """
+    POOL_BROWSERS Chromium instances × POOL_CONTEXTS contexts each. Every context is a
+    worker pulling exports from one shared queue, so idle workers take whatever is next.
+    We log in once and seed every other context with that storage state.
+    A worker whose page crashes, errors or exceeds POOL_TASK_TIMEOUT_S gets a fresh
+    context (and browser, if it died). Its export goes back on the queue for
+    whichever worker is free, up to POOL_MAX_ATTEMPTS tries.
+    """
+    def __init__(self, pw, budget: Optional[RunBudget] = None):
+        self.pw = pw
+        self.budget = budget
+        self.browsers: List = [None] * max(1, POOL_BROWSERS)
+        self.state = None
+        self._first = None  # (context, page) from the login, handed to worker 0
+
+    async def _browser(self, b: int):
+        br = self.browsers[b]
+        if br is None or not br.is_connected():
+            if br is not None:
+                print(f"[warn] pool: browser {b} died — relaunching")
+            br = self.browsers[b] = await get_browser(self.pw)
+        return br
+
+    async def start(self):
+        br = await self._browser(0)
+        context = await br.new_context(**CONTEXT_OPTS)
+        page = await context.new_page()
+        await login(page)
+        self.state = await context.storage_state()
+        self._first = (context, page)
+
+    async def _slot(self, b: int):
+        if b == 0 and self._first:
+            slot, self._first = self._first, None
+            return slot
+        context = await (await self._browser(b)).new_context(**CONTEXT_OPTS, storage_state=self.state)
+        page = await context.new_page()
+        await page.goto(ARMS_BASE or ARMS_LOGIN_URL, wait_until="load")
+        if "login" in page.url.lower():
+            await login(page)
+        return context, page
+
+    async def _worker(self, wid: str, b: int, queue: asyncio.Queue, uploads, failed: List[str]):
+        context = page = None
+        while True:
+            exp, attempt = await queue.get()
+            name = exp.get("name", "Unnamed")
+            try:
+                if self.budget and not self.budget.admit(exp):
+                    continue
+                if page is None or page.is_closed():
+                    context, page = await self._slot(b)
+                await asyncio.wait_for(do_one_export(page, exp, uploads), timeout=POOL_TASK_TIMEOUT_S)
+            except Exception as e:
+                why = "timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+                if attempt < POOL_MAX_ATTEMPTS:
+                    print(f"[warn] pool {wid}: {name} failed ({why}) — requeued, attempt {attempt + 1}")
+                    queue.put_nowait((exp, attempt + 1))
+                else:
+                    failed.append(f"{name}: {why}")
+                    print(f"[error] export failed for {name}: {why}")
+                try:
+                    if context: await context.close()
+                except Exception:
+                    pass
+                context = page = None  # recycled on the next task
+            finally:
+                queue.task_done()
+
+    async def run(self, exports: List[Dict], uploads) -> List[str]:
+        queue: asyncio.Queue = asyncio.Queue()
+        for exp in exports:
+            queue.put_nowait((exp, 1))
+        failed: List[str] = []
+        n_workers = min(len(exports), len(self.browsers) * max(1, POOL_CONTEXTS))
+        workers = [asyncio.create_task(self._worker(f"{i % len(self.browsers)}.{i // len(self.browsers)}",
+                                                    i % len(self.browsers), queue, uploads, failed))
+                   for i in range(n_workers)]
+        try:
+            await queue.join()
+        finally:
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return failed
+
+    async def close(self):
+        for br in self.browsers:
+            try:
+                if br: await br.close()
+            except Exception:
                 pass
-        
-        if not pwd:
-            raise RuntimeError("Could not find password field after waiting")
-        
-        await pwd.fill(ARMS_PASS)
-        
-        # submit
-        submitted = False
-        for b in [
-            page.get_by_role("button", name=re.compile(r"Sign in|Log in|Login", re.I)).first,
-            page.locator('button[type="submit"]').first,
-        ]:
+
+# ===================== MULTI-TENANT =====================
+TENANT_CONCURRENCY = int(os.getenv("TENANT_CONCURRENCY", "2"))
+
+# tenant config key → (env var it feeds, config key naming an env var to read it from)
+_TENANT_ENV = {
+    "username": ("ARMS_USERNAME", "usernameEnv"),
+    "password": ("ARMS_PASSWORD", "passwordEnv"),
+    "baseUrl":  ("ARMS_BASE_URL", "baseUrlEnv"),
+    "loginUrl": ("ARMS_LOGIN_URL", "loginUrlEnv"),
+    "sheetId":  ("SHEET_ID", "sheetIdEnv"),
+}
+
+def load_tenants(config: Dict, names: Optional[List[str]] = None) -> List[Dict]:
+    """
+    "tenants": [{"name": "softball", "usernameEnv": "SOFTBALL_ARMS_USERNAME",
+                 "passwordEnv": "SOFTBALL_ARMS_PASSWORD", "baseUrl": "...", "sheetId": "...",
+                 "exports": [...]}]
+    Secrets are referenced by env var name (…Env); plain values are allowed for the rest.
+    Top-level "exports" (and "joins") run as a "default" tenant on the usual ARMS_* / SHEET_ID
+    env; every other tenant gets only what its own entry provides.
+    """
+    tenants = list(config.get("tenants") or [])
+    if config.get("exports"):
+        tenants.insert(0, {"name": "default", "exports": config["exports"],
+                           "joins": config.get("joins") or [], "_inheritEnv": True})
+    if names:
+        want = {n.lower() for n in names}
+        tenants = [t for t in tenants if str(t.get("name", "")).lower() in want]
+    return tenants
+
+def tenant_views(config: Dict) -> List[tuple]:
+    """[(tenant name, ARMS_TENANT prefix, exports)] as run()/run_tenants would key their state."""
+    if not config.get("tenants"):
+        return [("", os.getenv("ARMS_TENANT", ""), config.get("exports", []))]
+    return [(t.get("name", "tenant"), f"{t.get('name', 'tenant')}/", t.get("exports", [])) for t in load_tenants(config)]
+
+@contextlib.contextmanager
+def as_tenant(prefix: str):
+    """ARMS_TENANT set to `prefix` for a read-only look at one tenant's state (status, plan)."""
+    saved = os.environ.get("ARMS_TENANT")
+    os.environ["ARMS_TENANT"] = prefix
+    try:
+        yield
+    finally:
+        if saved is None: os.environ.pop("ARMS_TENANT", None)
+        else: os.environ["ARMS_TENANT"] = saved
+
+# inherited account/sheet vars a non-default tenant must never fall back to
+_TENANT_CLEARED = ["ARMS_USERNAME", "ARMS_USER", "ARMS_PASSWORD", "ARMS_PASS",
+                   "ARMS_BASE_URL", "ARMS_LOGIN_URL", "SHEET_ID"]
+
+def _tenant_env(tenant: Dict) -> Dict[str, str]:
+    """
+    Env overrides for one tenant's worker. Inherited ARMS_* / SHEET_ID are blanked (set
+    to "" so .env can't refill them) unless this is the implicit default tenant, and a
+    referenced …Env var that isn't set is an error rather than a silent fallback.
+    """
+    name = tenant.get("name", "tenant")
+    env = {"ARMS_TENANT": f"{name}/"}
+    if not tenant.get("_inheritEnv"):
+        env.update({var: "" for var in _TENANT_CLEARED})
+    for key, (var, env_key) in _TENANT_ENV.items():
+        if tenant.get(env_key) and not os.getenv(tenant[env_key]):
+            raise ValueError(f"tenant '{name}': {env_key} names {tenant[env_key]}, which is not set")
+        val = tenant.get(key) or (os.getenv(tenant[env_key]) if tenant.get(env_key) else None)
+        if val:
+            env[var] = val
+    return env
+
+class _PrefixedStream:
+    """Prefix every output line so interleaved tenant logs stay readable."""
+    def __init__(self, stream, prefix: str):
+        self.stream, self.prefix, self.bol = stream, prefix, True
+
+    def write(self, s: str):
+        out = []
+        for line in s.splitlines(keepends=True):
+            out.append((self.prefix if self.bol else "") + line)
+            self.bol = line.endswith("\n")
+        self.stream.write("".join(out))
+        return len(s)
+
+    def flush(self):
+        self.stream.flush()
+
+def _reset_process_state():
+    """Drop module state a reused pool process still holds from its previous tenant."""
+    global CHECKPOINT
+    CHECKPOINT = Checkpoint()  # caches the previous tenant's checkpoint file
+    _UNSHARDED.clear()
+    STATS.new_run()
+
+def _tenant_worker(tenant: Dict, only: Optional[List[str]]) -> Dict:
+    """Process-pool entry point: one tenant, its own env, browser and event loop."""
+    name = tenant.get("name", "tenant")
+    stdout, saved_env = sys.stdout, dict(os.environ)  # pool processes can be reused (Python < 3.11)
+    sys.stdout = _PrefixedStream(stdout, f"[{name}] ")
+    t0 = time.perf_counter()
+    _reset_process_state()
+    try:
+        os.environ.update(_tenant_env(tenant))
+        res = asyncio.run(run(only=only, config={"exports": tenant.get("exports", []),
+                                                   "joins": tenant.get("joins", [])}))
+    except BaseException as e:  # SystemExit from load_env must not kill the pool
+        print(f"[error] {type(e).__name__}: {e}")
+        res = {"written": [], "failed": [f"{type(e).__name__}: {e}"], "deferred": []}
+    finally:
+        sys.stdout.flush()
+        sys.stdout = stdout
+        os.environ.clear(); os.environ.update(saved_env)
+    return {"tenant": name, "seconds": time.perf_counter() - t0, **res}
+
+def run_tenants(config: Dict, names: Optional[List[str]] = None, only: Optional[List[str]] = None) -> List[Dict]:
+    """Fan tenants out to worker processes (at most TENANT_CONCURRENCY at once) and aggregate."""
+    tenants = load_tenants(config, names)
+    if not tenants:
+        raise SystemExit("[fatal] No tenant matches.")
+    workers = max(1, min(TENANT_CONCURRENCY, len(tenants)))
+    print(f"[info] running {len(tenants)} tenant(s), {workers} at a time")
+    results = []
+    ctx = multiprocessing.get_context("spawn")  # no forking a process that holds threads/event loops
+    fresh = {"max_tasks_per_child": 1} if sys.version_info >= (3, 11) else {}  # a new process per tenant
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, **fresh) as pool:
+        futs = {pool.submit(_tenant_worker, t, only): t.get("name", "tenant") for t in tenants}
+        for fut in as_completed(futs):
             try:
-                await b.click(timeout=4000)
-                submitted = True
-                break
-            except:
-                continue
-        if not submitted:
+                results.append(fut.result())
+            except Exception as e:
+                results.append({"tenant": futs[fut], "seconds": 0.0, "written": [], "failed": [str(e)], "deferred": []})
+
+    print("\n[done] tenant summary:")
+    for r in sorted(results, key=lambda r: r["tenant"]):
+        state = "ok" if not r["failed"] else f"{len(r['failed'])} failed"
+        if r.get("deferred"):
+            state += f", {len(r['deferred'])} deferred"
+        print(f"  {r['tenant']:<20} {len(r['written'])} written, {state}, {r['seconds']:.0f}s")
+        for f in r["failed"]:
+            print(f"      - {f}")
+    return results
+
+# ===================== DAEMON / SCHEDULER =====================
+DAEMON_DEFAULT_EVERY_MIN = float(os.getenv("DAEMON_DEFAULT_EVERY_MIN", "60"))
+DAEMON_MAX_FAILURES      = int(os.getenv("DAEMON_MAX_FAILURES", "2"))
+
+def _cron_field(spec: str, lo: int, hi: int) -> set:
+    """Parse one cron field ('*', '5', '1-5', '*/15', '0,30', '10-40/10')."""
+    vals = set()
+    for part in spec.split(","):
+        rng, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if rng == "*":
+            a, b = lo, hi
+        elif "-" in rng:
+            a, b = (int(x) for x in rng.split("-", 1))
+        else:
+            a = int(rng); b = hi if step > 1 else a
+        if a < lo or b > hi or a > b:
+            raise ValueError(f"cron field '{spec}' out of range {lo}-{hi}")
+        vals.update(range(a, b + 1, step))
+    return vals
+
+def cron_next(expr: str, after: datetime) -> datetime:
+    """Next local time strictly after `after` matching a 5-field cron expression."""
+    f = expr.split()
+    if len(f) != 5:
+        raise ValueError(f"cron expression needs 5 fields: '{expr}'")
+    minutes, hours = _cron_field(f[0], 0, 59), _cron_field(f[1], 0, 23)
+    doms, months   = _cron_field(f[2], 1, 31), _cron_field(f[3], 1, 12)
+    dows = {d % 7 for d in _cron_field(f[4], 0, 7)}  # 0 and 7 are both Sunday
+    dom_any, dow_any = f[2] == "*", f[4] == "*"
+
+    def _day_ok(t):
+        dom_ok, dow_ok = t.day in doms, (t.weekday() + 1) % 7 in dows
+        if dom_any or dow_any:
+            return dom_ok and dow_ok
+        return dom_ok or dow_ok  # cron semantics when both are restricted
+
+    t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = after + timedelta(days=366 * 5)
+    while t <= limit:
+        if t.month not in months:
+            t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+        elif not _day_ok(t):
+            t = t.replace(hour=0, minute=0) + timedelta(days=1)
+        elif t.hour not in hours:
+            t = t.replace(minute=0) + timedelta(hours=1)
+        elif t.minute not in minutes:
+            t += timedelta(minutes=1)
+        else:
+            return t
+    raise ValueError(f"cron expression never fires: '{expr}'")
+
+def next_run_at(exp: Dict, after: datetime) -> datetime:
+    """
+    "schedule": {"cron": "0 7 * * *"}  or  {"everyMinutes": 30}
+    Exports without a schedule run every DAEMON_DEFAULT_EVERY_MIN minutes.
+    """
+    sched = exp.get("schedule") or {}
+    if sched.get("cron"):
+        return cron_next(sched["cron"], after)
+    return after + timedelta(minutes=float(sched.get("everyMinutes") or DAEMON_DEFAULT_EVERY_MIN))
+
+def _priority(exp: Dict) -> int:
+    """Higher runs first; default 0."""
+    try: return int(exp.get("priority", 0))
+    except (TypeError, ValueError): return 0
+
+class WarmSession:
+    """
+    One browser + logged-in page kept alive across scheduled runs.
+    Relaunches when the browser dies, re-logs in when ARMS bounces us to login.
+    """
+    def __init__(self, pw):
+        self.pw = pw
+        self.browser = self.context = self.page = None
+        self.failures = 0
+
+    async def _healthy(self) -> bool:
+        if not self.browser or not self.browser.is_connected() or self.page.is_closed():
+            return False
+        try:
+            await asyncio.wait_for(self.page.evaluate("1"), timeout=5)
+            return True
+        except Exception:
+            return False
+
+    async def close(self):
+        for closer in (self.context, self.browser):
             try:
-                await pwd.press("Enter")
-            except:
+                if closer: await closer.close()
+            except Exception:
                 pass
-        
-        await page.wait_for_load_state("networkidle")
-        print("[info] Login complete.")
+        self.browser = self.context = self.page = None
+
+    async def get_page(self):
+        if self.failures >= DAEMON_MAX_FAILURES or not await self._healthy():
+            if self.browser:
+                print("[warn] browser session unhealthy — relaunching")
+            await self.close()
+            self.browser, self.context, self.page = await launch_browser(self.pw)
+            await login(self.page)
+            self.failures = 0
+        elif "login" in self.page.url.lower():
+            print("[info] session expired — logging in again")
+            await login(self.page)
+        return self.page
+
+async def daemon():
+    """
+    Keep one warm browser/session and run each export on its own schedule.
+    Due exports are queued by priority; a trigger for an export that is already
+    queued is coalesced into the pending run instead of queuing a second one.
+    """
+    load_env()
+    from playwright.async_api import async_playwright
+    config = load_config()
+    exports = config.get("exports", [])
+    if config.get("tenants"):
+        print("[warn] daemon runs only the top-level exports; \"tenants\" are ignored")
+    now = datetime.now()
+    next_due = {i: now for i in range(len(exports))}  # everything runs once at startup
+    queue, pending, seq, cycle, started = [], set(), 0, [], datetime.now()
+    stop = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try: loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError): pass
 
+    async with async_playwright() as pw:
+        session = WarmSession(pw)
+        joins = JoinStage(config.get("joins") or [])
+        uploads = UploadPipeline(collect=joins.offer)
+        print(f"[info] daemon started with {len(exports)} scheduled export(s)")
+        while not stop.is_set():
+            now = datetime.now()
+            for i, due in next_due.items():
+                if due > now:
+                    continue
+                name = exports[i].get("name", "Unnamed")
+                if i in pending:
+                    print(f"[info] {name}: trigger coalesced into pending run")
+                else:
+                    heapq.heappush(queue, (-_priority(exports[i]), seq, i)); seq += 1
+                    pending.add(i)
+                try:
+                    next_due[i] = next_run_at(exports[i], now)
+                except ValueError as e:
+                    print(f"[error] {name}: bad schedule ({e}); disabling")
+                    next_due[i] = datetime.max
+
+            if not queue:
+                if cycle:
+                    await _daemon_cycle_end(cycle, uploads, joins, started)
+                    cycle = []
+                wake = min(next_due.values(), default=datetime.max)
+                delay = min(60.0, max(1.0, (wake - datetime.now()).total_seconds()))
+                try: await asyncio.wait_for(stop.wait(), timeout=delay)
+                except asyncio.TimeoutError: pass
+                continue
 
-        for exp in config.get("exports", []):
+            _, _, i = heapq.heappop(queue)
+            pending.discard(i)
+            exp = exports[i]
+            if not cycle:
+                started = datetime.now()
+                METRICS.reset()  # per cycle, like run() does per run
+            cycle.append(exp)
             try:
-                await do_one_export(page, exp)
+                page = await session.get_page()
+                await do_one_export(page, exp, uploads)
+                session.failures = 0
             except Exception as e:
+                session.failures += 1
+                uploads.failures.append(f"{exp.get('name','Unnamed')}: {e}")
                 print(f"[error] export failed for {exp.get('name','Unnamed')}: {e}")
+            STATS.save()
+            print(f"[info] {exp.get('name','Unnamed')}: next run at {next_due[i]:%Y-%m-%d %H:%M}")
 
-        print("\n[done] All exports processed.")
-        await context.close(); await browser.close()
+        print("[info] daemon stopping")
+        if cycle:
+            await _daemon_cycle_end(cycle, uploads, joins, started)
+        await uploads.close()
+        await session.close()
+
+async def _daemon_cycle_end(cycle: List[Dict], uploads: "UploadPipeline", joins: JoinStage, started: datetime):
+    """
+    After a batch of due exports: let their uploads finish, rebuild the joins they
+    fed, report the cycle's failures, then forget the checkpoint entries of the ones
+    that were written, so a later run/run-one doesn't skip them as "already written
+    by the interrupted run". Each cycle is recorded in the run history and checked
+    for regressions; fallback waste and step-timing samples are per cycle too, like
+    run() does per run.
+    """
+    await uploads.drain()
+    failed = uploads.failures + await asyncio.to_thread(joins.run, True)
+    written = len(uploads.written)
+    uploads.failures.clear(); uploads.written.clear()
+    if failed:
+        print(f"[error] {len(failed)} failure(s) this cycle: " + "; ".join(failed))
+    seconds = (datetime.now() - started).total_seconds()
+    METRICS.record("run", seconds)
+    run_id = f"{started:%Y%m%dT%H%M%S}-{os.getpid()}"
+    try:
+        save_run_history(run_id, started, seconds, written, len(failed))
+        check_regressions(run_id)
+    except Exception as e:
+        print(f"[warn] run history not recorded: {e}")
+    FALLBACKS.report()
+    FALLBACKS.stats.clear()
+    STATS.new_run()  # slowness is this cycle's ARMS speed, not the process lifetime's
+    keys = [export_key(e) for e in cycle]
+    CHECKPOINT.clear([k for k in keys if CHECKPOINT.stage(k) == "written"])
+    prune_downloads()
+
+# ===================== CLI =====================
+HEAVY_MODULES = ["pandas", "gspread", "google.oauth2.service_account", "playwright.async_api"]
+
+def _cold_import_s(stmt: str) -> Optional[float]:
+    """Seconds to run `stmt` in a fresh interpreter (so nothing is already cached in sys.modules)."""
+    code = f"import time; t = time.perf_counter(); {stmt}; print(time.perf_counter() - t)"
+    try:
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                             cwd=Path(__file__).parent, timeout=120)
+        return float(out.stdout.strip().splitlines()[-1])
+    except Exception:
+        return None
+
+def bench(rows: int = 50_000):
+    print("[bench] cold import cost (fresh interpreter each):")
+    mod = Path(__file__).stem
+    for stmt in [f"import {mod}"] + [f"import {m}" for m in HEAVY_MODULES]:
+        t = _cold_import_s(stmt)
+        print(f"  {stmt:<45} {'n/a' if t is None else f'{t * 1000:8.1f} ms'}")
+
+    import pandas as pd
+    df = pd.DataFrame({
+        "First Name": ["Ann"] * rows, "Last Name": ["Lee"] * rows,
+        "Mother's First Name": ["Jo"] * rows, "Mother's Last Name": ["Lee"] * rows,
+        "Father's First Name": ["Al"] * rows, "Father's Last Name": ["Lee"] * rows,
+        "Cell Phone": ["+15555550100"] * rows, "Twitter": ["@ann"] * rows, "Instagram": ["ann"] * rows,
+    })
+    print(f"[bench] transforms on {rows:,} synthetic rows:")
+    for t in DEFAULT_TRANSFORMS:
+        t0 = time.perf_counter(); df = TRANSFORMS[t](df)
+        print(f"  {t:<45} {(time.perf_counter() - t0) * 1000:8.1f} ms")
+
+def status():
+    """Print config/schedule/cache state without importing any heavy dependency."""
+    try:
+        config = load_config()
+    except Exception as e:
+        raise SystemExit(f"[fatal] cannot read config.json: {e}")
+    cache, probes, now = _read_cache(), _read_json(PROBE_PATH), datetime.now()
+    for tenant, prefix, exports in tenant_views(config):
+        print(f"[status] {len(exports)} export(s) in config.json" + (f" for tenant '{tenant}'" if tenant else ""))
+        for exp in exports:
+            name = exp.get("name", "Unnamed")
+            layout = exp.get("export", {}).get("layoutOptionText") or name.replace("_", " ")
+            outs = ", ".join(o["tab"] for o in export_outputs(exp)) or "-"
+            try: nxt = f"{next_run_at(exp, now):%Y-%m-%d %H:%M}"
+            except ValueError as e: nxt = f"bad schedule ({e})"
+            with as_tenant(prefix):
+                probe = probes.get(export_key(exp)) or {}
+            print(f"  {name}: layout='{layout}' → {outs}")
+            print(f"      priority={_priority(exp)}  next daemon run={nxt}")
+            if cache.get(layout): print(f"      last file: {cache[layout]}")
+            if probe: print(f"      last probe: total={probe.get('total')} latest={probe.get('latest')} at {probe.get('at')}")
+    if STATS.d:
+        print("[status] step latencies (p50 / p95 → budget):")
+        for step in sorted(STATS.d):
+            p50, p95 = STATS.p(step, 0.5), STATS.p(step, 0.95)
+            if p50 is not None:
+                print(f"  {step:<40} {p50:7.2f}s / {p95:7.2f}s → {p95 * TIMEOUT_MARGIN:7.2f}s")
+    if HISTORY_DB.exists():
+        con = _history_db()
+        try:
+            runs = con.execute("""SELECT r.started, r.tenant, r.seconds, r.written, r.failed,
+                                         (SELECT value FROM metrics m WHERE m.run_id = r.run_id AND m.name = 'sheets_calls')
+                                  FROM runs r ORDER BY r.started DESC LIMIT 5""").fetchall()
+        finally:
+            con.close()
+        print("[status] recent runs:")
+        for started, tenant, secs, written, failed, calls in runs:
+            print(f"  {started} {tenant or '-':<12} {secs:6.0f}s  {written} written, {failed} failed, {int(calls or 0)} Sheets calls")
+    env = {"ARMS_USERNAME/ARMS_USER": os.getenv("ARMS_USERNAME") or os.getenv("ARMS_USER"),
+           "ARMS_PASSWORD/ARMS_PASS": os.getenv("ARMS_PASSWORD") or os.getenv("ARMS_PASS"),
+           "ARMS_BASE_URL/ARMS_LOGIN_URL": os.getenv("ARMS_BASE_URL") or os.getenv("ARMS_LOGIN_URL"),
+           "SHEET_ID": os.getenv("SHEET_ID")}
+    print("[status] env: " + ", ".join(f"{k}={'set' if v else 'MISSING'}" for k, v in env.items()))
+
+def browser_server_cmd(action: str):
+    if action == "stop":
+        return stop_browser_server()
+    st = _read_json(BROWSER_SERVER_STATE)
+    if action == "status":
+        alive = bool(st) and _cdp_alive(st.get("endpoint", ""))
+        print(f"[status] browser server: {'up' if alive else 'down'}"
+              + (f" pid={st.get('pid')} endpoint={st.get('endpoint')} since {st.get('started')}" if st else ""))
+        return
+    from playwright.sync_api import sync_playwright
+    with sync_playwright() as pw:
+        print(f"[info] browser server at {ensure_browser_server(pw)}")
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="ARMS exports → Google Sheets")
+    sub = ap.add_subparsers(dest="cmd")
+    p_run = sub.add_parser("run", help="run every export in config.json (default)")
+    p_one = sub.add_parser("run-one", help="run only the named export(s)")
+    p_one.add_argument("names", nargs="+", help="export name, tab or layout text")
+    for p in (p_run, p_one):
+        p.add_argument("--tenant", action="append", help="only this tenant (repeatable)")
+        p.add_argument("--budget-min", type=float, help="defer exports that won't fit in this many minutes (RUN_BUDGET_MIN)")
+    sub.add_parser("daemon", help="keep a warm browser and run exports on their schedules")
+    p_bench = sub.add_parser("bench", help="measure import cost and transform throughput")
+    p_bench.add_argument("--rows", type=int, default=50_000)
+    sub.add_parser("status", help="show config, schedules and cached state")
+    sub.add_parser("plan", help="print the estimated execution plan without running it")
+    p_srv = sub.add_parser("browser-server", help="start/stop the long-lived Chromium used by BROWSER_SERVER=1")
+    p_srv.add_argument("action", choices=["start", "stop", "status"])
+    args = ap.parse_args(argv)
+
+    if args.cmd == "status":
+        status()
+    elif args.cmd == "plan":
+        for tenant, prefix, exports in tenant_views(load_config()):
+            if tenant:
+                print(f"\n[plan] tenant '{tenant}':")
+            with as_tenant(prefix):  # costs come from this tenant's run history
+                plan_exports(exports, min(len(exports), max(1, POOL_BROWSERS) * max(1, POOL_CONTEXTS)))
+    elif args.cmd == "bench":
+        bench(args.rows)
+    elif args.cmd == "browser-server":
+        browser_server_cmd(args.action)
+    elif args.cmd == "daemon":
+        asyncio.run(daemon())
+    else:
+        only = args.names if args.cmd == "run-one" else None
+        budget = getattr(args, "budget_min", None)
+        minutes = RUN_BUDGET_MIN if budget is None else budget
+        if minutes > 0 and not os.getenv("RUN_DEADLINE"):
+            # one end time for the whole invocation; tenant processes inherit it
+            os.environ["RUN_DEADLINE"] = f"{time.time() + minutes * 60:.0f}"
+        config = load_config()
+        if config.get("tenants"):
+            run_tenants(config, names=getattr(args, "tenant", None), only=only)
+        else:
+            asyncio.run(run(only=only, config=config, budget_min=budget))
 
 if __name__ == "__main__":
-    asyncio.run(run())
+    main()
 
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+import pytest
+
+import fetch_and_push as fp
+
+MON = datetime(2026, 10, 19, 8, 0)  # a Monday
+
+
+def test_strictly_after():
+    assert fp.cron_next("0 7 * * *", datetime(2026, 10, 19, 7, 0)) == datetime(2026, 10, 20, 7, 0)
+
+
+def test_dom_and_dow_both_restricted_fire_on_either():
+    assert fp.cron_next("0 7 1 * 1", MON) == datetime(2026, 10, 26, 7, 0)                 # Monday
+    assert fp.cron_next("0 7 1 * 1", datetime(2026, 10, 27)) == datetime(2026, 11, 1, 7, 0)  # the 1st, a Sunday
+
+
+def test_only_dow_restricted_needs_the_weekday():
+    assert fp.cron_next("0 7 * * 1", datetime(2026, 10, 27)) == datetime(2026, 11, 2, 7, 0)
+
+
+def test_sunday_as_seven():
+    assert fp.cron_next("0 9 * * 7", MON) == datetime(2026, 10, 25, 9, 0)
+
+
+def test_month_rollover_skips_short_months():
+    assert fp.cron_next("30 23 31 * *", datetime(2026, 10, 31, 23, 30)) == datetime(2026, 12, 31, 23, 30)
+
+
+def test_year_rollover():
+    assert fp.cron_next("0 0 1 1 *", datetime(2026, 12, 31, 23, 59)) == datetime(2027, 1, 1, 0, 0)
+    assert fp.cron_next("0 12 29 2 *", datetime(2026, 3, 1)) == datetime(2028, 2, 29, 12, 0)
+
+
+def test_never_fires():
+    with pytest.raises(ValueError):
+        fp.cron_next("0 0 31 2 *", MON)
@@ -0,0 +1,32 @@
+import fetch_and_push as fp
+
+
+def _page(start, n):
+    return [{"id": i, "name": f"r{i}"} for i in range(start, start + n)]
+
+
+def test_complete_distinct_pages_are_accepted():
+    assert fp.paging_problem([_page(0, 3), _page(3, 3), _page(6, 1)], 7) is None
+
+
+def test_server_ignoring_paging_is_rejected():
+    pages = [_page(0, 3), _page(0, 3), _page(0, 1)]
+    assert "repeat" in fp.paging_problem(pages, 7)
+
+
+def test_count_must_match_exactly():
+    assert fp.paging_problem([_page(0, 3), _page(3, 3)], 5) == "got 6 records, expected 5"
+    assert fp.paging_problem([_page(0, 3)], 5) == "got 3 records, expected 5"
+
+
+def test_duplicate_ids_are_rejected():
+    pages = [_page(0, 3), [{"id": 2, "name": "again"}, {"id": 9, "name": "x"}]]
+    assert "duplicate" in fp.paging_problem(pages, 5)
+
+
+def test_total_is_read_beside_the_records_only():
+    body = {"meta": {"count": 3}, "data": {"totalCount": 120, "items": _page(0, 2)}}
+    found = fp._find_records(body)
+    assert found[0] == ("data", "items")
+    assert fp._find_total(body, found[0]) == 120
+    assert fp._find_total({"stats": {"count": 9}, "items": _page(0, 2)}, ("items",)) is None
@@ -0,0 +1,36 @@
+import pandas as pd
+
+import fetch_and_push as fp
+
+
+def test_join_normalizes_keys_dedupes_and_coalesces_in_source_order():
+    contact = pd.DataFrame({"Full Name": ["Ann  Lee", "Bo Chan", "bo chan", ""],
+                            "Phone": ["1", "", "3", "4"], "Email": ["a@x", "b@x", "", "z@x"]})
+    socials = pd.DataFrame({"Full Name": ["ANN LEE", "Bo Chan", "Cy Diaz"],
+                            "Phone": ["9", "8", "7"], "Twitter": ["@ann", "@bo", "@cy"]})
+    master = fp.join_frames([("contact", contact), ("socials", socials)], ["Full Name"])
+    rows = {r["Full Name"]: r for r in master.fillna("").to_dict("records")}
+    assert len(master) == 3  # the duplicate "bo chan" and the blank key are dropped
+    assert rows["Ann  Lee"]["Phone"] == "1"       # earlier source wins
+    assert rows["Bo Chan"]["Phone"] == "8"        # blanks are filled from later ones
+    assert rows["Ann  Lee"]["Twitter"] == "@ann"
+    assert rows["Cy Diaz"]["Email"] == ""         # outer join keeps one-sided recruits
+
+
+def test_skipped_source_joins_from_its_kept_copy(tmp_path, monkeypatch):
+    monkeypatch.setattr(fp, "JOIN_SOURCES_DIR", tmp_path)
+    written = []
+    monkeypatch.setattr(fp, "write_sinks", lambda df, specs, label: written.append(df) or True)
+    join = [{"tab": "M", "key": "Name", "sources": ["A", "B"]}]
+    a, b = pd.DataFrame({"Name": ["x"], "p": ["1"]}), pd.DataFrame({"Name": ["x"], "q": ["2"]})
+
+    first = fp.JoinStage(join)
+    first.offer("A", a); first.offer("B", b)
+    assert first.run() == [] and len(written) == 1
+
+    second = fp.JoinStage(join)   # B's export was skipped as unchanged
+    second.offer("A", a.assign(p="3"))
+    assert second.run() == []
+    assert written[-1].to_dict("records") == [{"Name": "x", "p": "3", "q": "2"}]
+
+    assert fp.JoinStage(join).run() == [] and len(written) == 2  # nothing changed
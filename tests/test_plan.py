@@ -0,0 +1,38 @@
+import fetch_and_push as fp
+
+
+def _plan(monkeypatch, costs, exports=None, workers=1):
+    exports = exports or [{"name": n} for n in costs]
+    monkeypatch.setattr(fp, "export_costs", lambda exps: {
+        n: {"extract": e, "publish": p, "known": True} for n, (e, p) in costs.items()})
+    monkeypatch.setattr(fp, "UPLOAD_WORKERS", 1)
+    return [e["name"] for e in fp.plan_exports(exports, workers, show=False)]
+
+
+def test_never_worse_than_config_order(monkeypatch):
+    # LPT would put A first (4.2 min); file order finishes in 2.8 min
+    assert _plan(monkeypatch, {"A": (100, 60), "B": (10, 140)}) == ["B", "A"]
+
+
+def test_johnson_order_for_extract_then_publish(monkeypatch):
+    costs = {"A": (50, 10), "B": (10, 60), "C": (30, 40), "D": (60, 5)}
+    assert _plan(monkeypatch, costs) == ["B", "C", "A", "D"]
+
+
+def test_priority_still_goes_first(monkeypatch):
+    exports = [{"name": "A"}, {"name": "B", "priority": 5}]
+    assert _plan(monkeypatch, {"A": (10, 100), "B": (300, 10)}, exports) == ["B", "A"]
+
+
+def test_simulation_makespan():
+    costs = {"A": {"extract": 100, "publish": 60}, "B": {"extract": 10, "publish": 140}}
+    _, makespan = fp.simulate_plan([{"name": "A"}, {"name": "B"}], costs, 1, 1)
+    assert makespan == 300  # B waits for the uploader until A is written at 160
+
+
+def test_budget_uses_the_shared_deadline(monkeypatch):
+    monkeypatch.setenv("RUN_DEADLINE", str(fp.time.time() + 60))
+    budget = fp.RunBudget(25, {"A": {"extract": 100, "publish": 30}, "B": {"extract": 20, "publish": 10}})
+    assert budget.remaining() <= 60
+    assert not budget.admit({"name": "A"}) and budget.admit({"name": "B"})
+    assert budget.deferred == ["A"]
@@ -0,0 +1,48 @@
+import asyncio
+
+import fetch_and_push as fp
+
+
+class _Resp:
+    def __init__(self, body):
+        self.body = body
+        self.request = type("Req", (), {"resource_type": "xhr"})()
+        self.headers = {"content-type": "application/json"}
+
+    async def json(self):
+        return self.body
+
+
+def _signature(records, total):
+    probe = fp.RecruitsProbe(page=None)
+    asyncio.run(probe._on_response(_Resp({"total": total, "data": records})))
+    return probe.total, probe.latest
+
+
+def test_probe_keeps_latest_only_for_the_full_set():
+    records = [{"id": i, "lastUpdated": f"2026-10-{10 + i:02d}T00:00:00"} for i in range(3)]
+    assert _signature(records, 3) == (3, "2026-10-12T00:00:00")
+    assert _signature(records[:2], 3) == (3, None)  # page 1 of a paged grid
+
+
+def _remember(tmp_path, monkeypatch, prev):
+    monkeypatch.setattr(fp, "PROBE_PATH", tmp_path / "probes.json")
+    fp._write_json(fp.PROBE_PATH, {"k": prev})
+
+
+def test_count_only_signature_needs_count_mode(tmp_path, monkeypatch):
+    now = fp.datetime.now().isoformat()
+    _remember(tmp_path, monkeypatch, {"total": 5, "latest": None, "at": now})
+    sig = {"total": 5, "latest": None}
+    assert not fp.probe_unchanged("k", sig, {})
+    assert fp.probe_unchanged("k", sig, {"skipIfUnchanged": "count"})
+    assert not fp.probe_unchanged("k", {"total": 6, "latest": None}, {"skipIfUnchanged": "count"})
+
+
+def test_probe_expires_after_max_age(tmp_path, monkeypatch):
+    sig = {"total": 5, "latest": "2026-10-01"}
+    _remember(tmp_path, monkeypatch, {**sig, "at": fp.datetime.now().isoformat()})
+    assert fp.probe_unchanged("k", sig, {})
+    old = fp.datetime.now() - fp.timedelta(hours=fp.PROBE_MAX_AGE_H + 1)
+    _remember(tmp_path, monkeypatch, {**sig, "at": old.isoformat()})
+    assert not fp.probe_unchanged("k", sig, {})
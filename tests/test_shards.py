@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+
+import fetch_and_push as fp
+
+
+def _frame(rows, cols=2):
+    return pd.DataFrame({f"c{i}": range(rows) for i in range(cols)})
+
+
+def test_auto_shards_stay_one_tab_without_extra_spreadsheets(monkeypatch):
+    monkeypatch.setattr(fp, "SHEETS_SHARD_CELLS", 10)
+    monkeypatch.setattr(fp, "SHEETS_SHARD_SPREADSHEETS", [])
+    assert fp.plan_shards(_frame(20), {"tab": "T"}) is None
+
+
+def test_auto_shards_refuse_over_the_spreadsheet_cap(monkeypatch):
+    monkeypatch.setattr(fp, "SHEETS_SHARD_CELLS", 10)
+    monkeypatch.setattr(fp, "SHEETS_CELL_LIMIT", 30)
+    monkeypatch.setattr(fp, "SHEETS_SHARD_SPREADSHEETS", [])
+    with pytest.raises(ValueError, match="spreadsheet cap"):
+        fp.plan_shards(_frame(20), {"tab": "T"})
+
+
+def test_auto_shards_roll_over_into_extra_spreadsheets(monkeypatch):
+    monkeypatch.setattr(fp, "SHEET_ID", "home")
+    monkeypatch.setattr(fp, "SHEETS_SHARD_CELLS", 22)
+    monkeypatch.setattr(fp, "SHEETS_CELL_LIMIT", 30)
+    monkeypatch.setattr(fp, "SHEETS_SHARD_SPREADSHEETS", ["extra"])
+    shards = fp.plan_shards(_frame(20), {"tab": "T"})
+    assert [s["sheet"] for s in shards] == ["home", "extra"]
+    assert sum(len(s["df"]) for s in shards) == 20
+
+
+def test_shards_refuse_when_one_spreadsheet_overflows(monkeypatch):
+    monkeypatch.setattr(fp, "SHEETS_CELL_LIMIT", 30)
+    with pytest.raises(ValueError, match="one spreadsheet"):
+        fp.plan_shards(_frame(20), {"tab": "T", "shard": {"maxRows": 5, "spreadsheets": ["a"]}})
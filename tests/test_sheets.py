@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+import fetch_and_push as fp
+
+
+def test_frame_values_match_set_with_dataframe():
+    df = pd.DataFrame({"a": ["'quoted", "plain", None], "b": [1.5, float("nan"), 3.0],
+                       "c": pd.to_datetime(["2026-01-02", None, "2026-03-04"])})
+    assert fp._frame_values(df) == [
+        ["''quoted", 1.5, "2026-01-02 00:00:00"],
+        ["plain", "", ""],
+        ["", 3.0, "2026-03-04 00:00:00"],
+    ]
+
+
+class _RateLimited(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.response = type("Resp", (), {"status_code": code})()
+
+
+def test_sheets_call_retries_429_then_succeeds(monkeypatch):
+    sleeps, calls = [], []
+    monkeypatch.setattr(fp.time, "sleep", sleeps.append)
+    monkeypatch.setattr(fp, "SHEETS_BUCKET", fp.TokenBucket(60_000, burst=100))
+
+    def fn(x):
+        calls.append(x)
+        if len(calls) < 3:
+            raise _RateLimited(429)
+        return x * 2
+
+    assert fp.sheets_call(fn, 21, what="update") == 42
+    assert len(calls) == 3
+    assert len(sleeps) == 2 and 0.5 <= sleeps[0] <= 1.0 and 1.0 <= sleeps[1] <= 2.0
+
+
+def test_sheets_call_raises_non_retryable_at_once(monkeypatch):
+    monkeypatch.setattr(fp, "SHEETS_BUCKET", fp.TokenBucket(60_000, burst=100))
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise _RateLimited(403)
+
+    with pytest.raises(_RateLimited):
+        fp.sheets_call(fn)
+    assert calls == [1]
+
+
+def test_write_rows_chunks_into_a1_ranges(monkeypatch):
+    monkeypatch.setattr(fp, "SHEETS_CHUNK_CELLS", 6)   # 3 columns → 2 rows per chunk
+    monkeypatch.setattr(fp, "SHEETS_BUCKET", fp.TokenBucket(60_000, burst=100))
+    ranges = []
+
+    class WS:
+        def update(self, values, range_name, value_input_option):
+            ranges.append((range_name, len(values)))
+
+    fp.write_rows(WS(), [["a", "b", "c"]] * 5, start_row=3)
+    assert sorted(ranges) == [("A3:C4", 2), ("A5:C6", 2), ("A7:C7", 1)]
@@ -0,0 +1,61 @@
+import pytest
+
+import fetch_and_push as fp
+
+
+def test_missing_referenced_env_var_fails_the_tenant(monkeypatch):
+    monkeypatch.delenv("SOFT_SHEET_ID", raising=False)
+    with pytest.raises(ValueError, match="SOFT_SHEET_ID"):
+        fp._tenant_env({"name": "soft", "sheetIdEnv": "SOFT_SHEET_ID"})
+
+
+def test_tenant_does_not_inherit_default_account(monkeypatch):
+    monkeypatch.setenv("ARMS_USERNAME", "default-user")
+    monkeypatch.setenv("SHEET_ID", "default-sheet")
+    monkeypatch.setenv("SOFT_USER", "soft-user")
+    env = fp._tenant_env({"name": "soft", "usernameEnv": "SOFT_USER"})
+    assert env["ARMS_USERNAME"] == "soft-user"
+    assert env["SHEET_ID"] == ""
+    assert env["ARMS_PASSWORD"] == "" and env["ARMS_PASS"] == ""
+
+
+def test_default_tenant_keeps_env_and_joins():
+    config = {"exports": [{"name": "A"}], "joins": [{"tab": "M"}], "tenants": [{"name": "soft"}]}
+    default = fp.load_tenants(config)[0]
+    assert default["joins"] == [{"tab": "M"}]
+    assert fp._tenant_env(default) == {"ARMS_TENANT": "default/"}
+
+
+def test_reused_worker_reads_the_next_tenants_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(fp, "CHECKPOINT", fp.CHECKPOINT)  # restored after the worker replaces it
+    monkeypatch.setattr(fp.Checkpoint, "path", property(
+        lambda self: tmp_path / f"cp-{fp.os.getenv('ARMS_TENANT', '').strip('/')}.json"))
+    fp._write_json(tmp_path / "cp-b.json", {"updated": fp.datetime.now().isoformat(),
+                                            "exports": {"b/X|X": {"stage": "written", "run": "old"}}})
+    seen = {}
+
+    async def fake_run(only=None, config=None):
+        tenant = fp.os.getenv("ARMS_TENANT")
+        seen[tenant] = fp.CHECKPOINT.resume_point(f"{tenant}X|X")
+        fp.CHECKPOINT.mark(f"{tenant}Y|Y", "submitted")
+        return {"written": [], "failed": [], "deferred": []}
+
+    monkeypatch.setattr(fp, "run", fake_run)
+    for name in ("a", "b"):
+        fp._tenant_worker({"name": name, "_inheritEnv": True}, None)
+    assert seen["b/"]["stage"] == "written"
+    assert "a/Y|Y" not in fp._read_json(tmp_path / "cp-b.json")["exports"]
+
+
+def test_status_shows_probes_stored_under_tenant_keys(tmp_path, monkeypatch, capsys):
+    config = {"exports": [{"name": "A"}], "tenants": [{"name": "soft", "exports": [{"name": "B"}]}]}
+    monkeypatch.setattr(fp, "load_config", lambda: config)
+    monkeypatch.setattr(fp, "PROBE_PATH", tmp_path / "probes.json")
+    monkeypatch.setattr(fp, "CACHE_PATH", tmp_path / "cache.json")
+    monkeypatch.setattr(fp, "HISTORY_DB", tmp_path / "history.sqlite")
+    monkeypatch.setattr(fp.STATS, "_d", {})
+    fp._write_json(fp.PROBE_PATH, {"default/A|A": {"total": 1, "at": "t"}, "soft/B|B": {"total": 2, "at": "t"}})
+    fp.status()
+    out = capsys.readouterr().out
+    assert "for tenant 'soft'" in out
+    assert "total=1" in out and "total=2" in out
@@ -0,0 +1,50 @@
+import pytest
+
+import fetch_and_push as fp
+
+
+@pytest.fixture
+def stats(tmp_path, monkeypatch):
+    st = fp.StepStats(tmp_path / "stats.json")
+    st._d = {}
+    monkeypatch.setattr(fp, "STATS", st)
+    monkeypatch.setattr(fp, "TIMEOUT_MARGIN", 2.0)
+    monkeypatch.setattr(fp, "POLL_MIN_S", 1.0)
+    monkeypatch.setattr(fp, "POLL_MAX_S", 15.0)
+    return st
+
+
+def test_poll_without_history_uses_the_minimum(stats):
+    polls = fp.PollSchedule("export.job:X")
+    assert [polls.next(t) for t in (0, 100, 1000)] == [1.0, 1.0, 1.0]
+
+
+def test_poll_follows_the_learned_eta(stats):
+    stats.d["export.job:X"] = [100.0] * 5          # ETA 100s, lead 80s, late 120s
+    polls = fp.PollSchedule("export.job:X")
+    assert polls.next(0) == 15.0                   # sparse, capped at POLL_MAX_S
+    assert polls.next(75) == 2.5                   # half the way to 0.8 × ETA
+    assert polls.next(79.5) == 1.0                 # never under POLL_MIN_S
+    assert polls.next(100) == 1.0                  # between the ETA and the usual worst case
+    assert [polls.next(130) for _ in range(3)] == [1.5, 2.25, 3.375]  # running late: ×1.5
+
+
+def test_timeout_defaults_without_history(stats):
+    assert stats.timeout_ms("login.password", 6000) == 6000
+
+
+def test_timeout_floor_stays_near_default_until_warm(stats):
+    stats.d["login.password"] = [1.0] * 5          # p95 × margin = 2000ms
+    assert stats.timeout_ms("login.password", 6000) == 4500
+    stats._run["page.settle"] = [0.5] * 3
+    assert stats.timeout_ms("login.password", 6000) == 2000
+    assert stats.timeout_ms("login.password", 6000, floor_ms=3000) == 3000
+
+
+def test_timeout_is_capped_and_scaled_by_slowness(stats):
+    stats.d["slow.step"] = [100.0] * 5
+    assert stats.timeout_ms("slow.step", 1000) == 4000   # 4 × default
+    stats.d["fast.step"] = [1.0] * 5
+    stats.d["page.settle"] = [1.0] * 5
+    stats._run["page.settle"] = [2.0] * 3                # today ARMS is twice as slow
+    assert stats.timeout_ms("fast.step", 6000) == 4000
@@ -0,0 +1,71 @@
+import os
+
+import pandas as pd
+import pytest
+
+import fetch_and_push as fp
+
+pytest.importorskip("pyarrow")
+
+
+def _frame(n):
+    df = pd.DataFrame({
+        "First Name": [f"A{i}" for i in range(n)],
+        "Last Name": ["B"] * n,
+        "Cell Phone": ["+1 555 0100"] * n,
+        "Twitter": ["@recruit"] * n,
+        "Rank": range(n),
+    })
+    df.loc[5, "Cell Phone"] = None
+    df.loc[7, "Twitter"] = None
+    return df
+
+
+def _shm_segments():
+    try:
+        return {n for n in os.listdir("/dev/shm") if n.startswith("psm_")}
+    except FileNotFoundError:
+        return set()
+
+
+def test_parallel_transforms_matches_in_process(monkeypatch):
+    monkeypatch.setattr(fp, "TRANSFORM_WORKERS", 3)
+    monkeypatch.setattr(fp, "_TRANSFORM_POOL", None)
+    df = _frame(3001)
+    before = _shm_segments()
+
+    parallel = fp.parallel_transforms(df.copy(), fp.DEFAULT_TRANSFORMS)
+
+    monkeypatch.setattr(fp, "TRANSFORM_PARALLEL_ROWS", 10**9)
+    expected = fp.apply_transforms(df.copy(), fp.DEFAULT_TRANSFORMS)
+    pd.testing.assert_frame_equal(parallel, expected)
+    assert _shm_segments() <= before
+    fp._TRANSFORM_POOL.shutdown()
+
+
+def test_to_shm_round_trip():
+    import pyarrow as pa
+    df = _frame(10)
+    name, size = fp._to_shm(pa.Table.from_pandas(df, preserve_index=False))
+    back = fp._from_shm(name, size, offset=2, length=3, unlink=True)
+    pd.testing.assert_frame_equal(back, df.iloc[2:5].reset_index(drop=True))
+
+
+def test_derived_outputs_skip_transforms_the_source_ran(tmp_path, monkeypatch):
+    monkeypatch.setattr(fp.CHECKPOINT, "mark", lambda *a, **k: None)
+    derived = {"tab": "Socials", "columns": ["First Name", "Twitter"],
+               "transforms": ["add_full_name_columns", "add_social_urls"],
+               "sinks": [{"type": "csv", "path": str(tmp_path / "{tab}.csv")}]}
+    exp = {"name": "X", "tab": "Raw", "derived": [derived],
+           "sinks": [{"type": "csv", "path": str(tmp_path / "{tab}.csv")}]}
+    assert fp._publish_frame(_frame(10), exp)
+    raw = pd.read_csv(tmp_path / "Raw.csv", dtype=str)
+    out = pd.read_csv(tmp_path / "Socials.csv", dtype=str)
+    assert list(out["Twitter"].fillna("")) == list(raw["Twitter"].fillna(""))
+
+
+def test_optimize_drops_empty_columns_trims_rows_and_keeps_declared_order():
+    df = pd.DataFrame({"A": ["1", "2", "", None], "B": [None, " ", "", None], "C": ["x", "", "", ""]})
+    out = fp.optimize_frame(df, {"columns": ["c", "B", "a"], "dropEmptyColumns": True, "trimEmptyRows": True})
+    assert list(out.columns) == ["C", "A"]
+    assert out.to_dict("list") == {"C": ["x", ""], "A": ["1", "2"]}